@@ -0,0 +1,94 @@
+"""Compare the per-row Pydantic list path with the projected orjson fast path.
+
+    python bench_serialisation.py [rows ...]
+
+The old path is what the list routes used to do: copy _id into id, build
+a Tyre per document, validate the list again for response_model=List[Tyre]
+and encode with the standard json module. The fast path encodes the
+documents produced by tyre_projection() (id already a string) with orjson.
+No database is needed; documents are generated in memory, and Tyre is
+defined here so server.py (which connects on import) is not loaded.
+"""
+import json
+import sys
+import time
+from datetime import datetime
+from typing import List, Optional
+
+import orjson
+from bson import ObjectId
+from pydantic import BaseModel, TypeAdapter
+
+REPEATS = 5
+
+
+class Tyre(BaseModel):
+    """Same fields as server.Tyre"""
+    id: Optional[str] = None
+    brand: str
+    size: str
+    type: str
+    pattern: str
+    stock: int = 0
+    price: float
+    created_at: datetime
+    updated_at: datetime
+
+
+def make_documents(rows: int, projected: bool) -> List[dict]:
+    now = datetime.utcnow()
+    documents = []
+    for i in range(rows):
+        document = {
+            'brand': ('MRF', 'TVS', 'CEAT', 'BEDROCK')[i % 4],
+            'size': f"{80 + i % 60}/100*{10 + i % 9}",
+            'type': 'TL',
+            'pattern': f"ZAPPER {i % 50}",
+            'stock': i % 20,
+            'price': 1000.0 + i % 900,
+            'created_at': now,
+            'updated_at': now,
+        }
+        if projected:
+            document['id'] = str(ObjectId())
+        else:
+            document['_id'] = ObjectId()
+        documents.append(document)
+    return documents
+
+
+def model_path(documents: List[dict]) -> bytes:
+    result = []
+    for tyre in documents:
+        tyre = dict(tyre)
+        tyre['id'] = str(tyre['_id'])
+        del tyre['_id']
+        result.append(Tyre(**tyre))
+    adapter = TypeAdapter(List[Tyre])
+    validated = adapter.validate_python(result)
+    return json.dumps(adapter.dump_python(validated, mode='json')).encode()
+
+
+def fast_path(documents: List[dict]) -> bytes:
+    return orjson.dumps(documents)
+
+
+def best_of(function, documents) -> float:
+    timings = []
+    for _ in range(REPEATS):
+        started = time.perf_counter()
+        function(documents)
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main(sizes: List[int]):
+    print(f"{'rows':>8} {'pydantic ms':>12} {'orjson ms':>10} {'speed-up':>9}")
+    for rows in sizes:
+        slow = best_of(model_path, make_documents(rows, projected=False))
+        fast = best_of(fast_path, make_documents(rows, projected=True))
+        print(f"{rows:>8} {slow * 1000:>12.2f} {fast * 1000:>10.2f} {slow / fast:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [100, 1000, 10000, 50000])
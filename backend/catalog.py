@@ -0,0 +1,76 @@
+"""Catalog version and the in-process cache of serialised read responses.
+
+The version lives in the `meta` collection so every worker sees the same
+value; it is bumped after each write. Read routes send it as an ETag and
+reuse serialised bodies cached for the current version.
+"""
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+from fastapi import Request
+from pymongo import ReturnDocument
+
+CATALOG_ID = 'catalog'
+
+
+async def catalog_version(db, session=None) -> int:
+    """Current catalog version (0 before the first write)"""
+    meta = await db.meta.find_one({'_id': CATALOG_ID}, {'version': 1}, session=session)
+    return meta['version'] if meta else 0
+
+
+async def bump_catalog_version(db) -> int:
+    """Mark the catalog as changed; call after the write has been applied"""
+    meta = await db.meta.find_one_and_update(
+        {'_id': CATALOG_ID},
+        {'$inc': {'version': 1}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    return meta['version']
+
+
+def make_etag(version: int, variant: str = '') -> str:
+    """ETag for a catalog version; variant tells representations apart"""
+    return f'"{version}-{variant}"' if variant else f'"{version}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Whether If-None-Match names the given ETag (weak or strong)"""
+    header = request.headers.get('if-none-match')
+    if not header:
+        return False
+    if header.strip() == '*':
+        return True
+    tags = (tag.strip() for tag in header.split(','))
+    return etag in (tag[2:] if tag.startswith('W/') else tag for tag in tags)
+
+
+class CatalogCache:
+    """Bounded LRU of response bodies, valid for a single catalog version"""
+
+    def __init__(self, max_entries: int = 64):
+        self.max_entries = max_entries
+        self.version: Optional[int] = None
+        self.entries: OrderedDict = OrderedDict()
+
+    def get(self, version: int, key: Hashable) -> Optional[Any]:
+        if version != self.version:
+            return None
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+        return entry
+
+    def put(self, version: int, key: Hashable, entry: Any) -> None:
+        if self.version is not None and version < self.version:
+            # Built from a read that raced a write; never cache stale data
+            return
+        if version != self.version:
+            # A newer version invalidates everything cached so far
+            self.version = version
+            self.entries.clear()
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
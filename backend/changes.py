@@ -0,0 +1,172 @@
+"""Sync tokens and tombstones for the GET /api/tyres/changes feed.
+
+A token is the (updated_at, _id) position of the last change a client has
+seen, so the feed is a keyset scan over the (updated_at, _id) index.
+Deleted tyres leave a tombstone in `tyre_tombstones` with their deletion
+time. Tombstones are only sent to clients resuming from a token, paged
+together with the changed tyres, and MongoDB removes them after
+TOMBSTONE_RETENTION; older tokens are refused, as the deletes they missed
+may be gone.
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import ASCENDING, IndexModel
+
+EPOCH = datetime(1970, 1, 1)
+MIN_OBJECT_ID = ObjectId('0' * 24)
+
+# Writes stamp updated_at before they commit, so a change can become
+# visible slightly after newer ones. Tokens never move past this horizon.
+SYNC_SAFETY_WINDOW = timedelta(seconds=5)
+
+TYRE_CHANGE_INDEXES = [
+    [('updated_at', ASCENDING), ('_id', ASCENDING)],
+]
+# Clients that have not synced for this long start again without a token
+TOMBSTONE_RETENTION = timedelta(days=30)
+
+TOMBSTONE_INDEXES = [
+    [('deleted_at', ASCENDING), ('_id', ASCENDING)],
+    # TTL indexes must be single-field; expired tombstones are deleted by the server
+    IndexModel([('deleted_at', ASCENDING)], expireAfterSeconds=int(TOMBSTONE_RETENTION.total_seconds())),
+]
+
+Position = Tuple[datetime, ObjectId]
+
+logger = logging.getLogger(__name__)
+
+
+def encode_token(position: Position) -> str:
+    updated_at, oid = position
+    return f"{(updated_at - EPOCH) // timedelta(milliseconds=1)}-{oid}"
+
+
+def decode_token(token: str) -> Position:
+    """Raise ValueError for tokens this server did not issue"""
+    try:
+        millis, oid = token.split('-', 1)
+        return EPOCH + timedelta(milliseconds=int(millis)), ObjectId(oid)
+    except (InvalidId, TypeError, OverflowError) as e:
+        # int() raises ValueError itself, for non-numeric or missing parts
+        raise ValueError(str(e))
+
+
+def after(position: Optional[Position], field: str = 'updated_at') -> dict:
+    """Query for tyres (or, with field='deleted_at', tombstones) changed
+    after a position"""
+    if position is None:
+        return {}
+    changed_at, oid = position
+    return {'$or': [
+        {field: {'$gt': changed_at}},
+        {field: changed_at, '_id': {'$gt': oid}},
+    ]}
+
+
+def expired(position: Position) -> bool:
+    """Whether tombstones after this position may already have been removed"""
+    return position[0] < datetime.utcnow() - TOMBSTONE_RETENTION
+
+
+def next_position(since: Optional[Position], last: Optional[Position], has_more: bool) -> Position:
+    """Token position to hand back after a page of changes.
+
+    Mid-feed pages continue from the last row. The final page stops at the
+    safety horizon so late-committing writes are picked up next time; rows
+    newer than that may be sent again, which clients apply idempotently.
+    """
+    if has_more:
+        return last
+    horizon = (datetime.utcnow() - SYNC_SAFETY_WINDOW, MIN_OBJECT_ID)
+    position = min(last, horizon) if last else horizon
+    if since and since > position:
+        return since
+    return position
+
+
+async def record_tombstone(db, tyre_id: ObjectId) -> None:
+    await db.tyre_tombstones.replace_one(
+        {'_id': tyre_id},
+        {'deleted_at': datetime.utcnow()},
+        upsert=True,
+    )
+
+
+async def fetch_changes(db, position: Optional[Position], limit: int):
+    """One page of the feed: (tyre docs, deleted ObjectIds, next position, has_more).
+
+    Changed tyres and tombstones are merged in (time, _id) order and cut
+    to `limit` rows together. A first sync (no position) gets no
+    tombstones: the tyres they stand for are not in the results anyway.
+    """
+    tyres = await db.tyres.find(after(position)).sort(
+        [('updated_at', 1), ('_id', 1)]
+    ).limit(limit + 1).to_list(limit + 1)
+    tombstones = []
+    if position is not None:
+        tombstones = await db.tyre_tombstones.find(after(position, 'deleted_at')).sort(
+            [('deleted_at', 1), ('_id', 1)]
+        ).limit(limit + 1).to_list(limit + 1)
+
+    rows = sorted(
+        [(tyre['updated_at'], tyre['_id'], tyre) for tyre in tyres]
+        + [(tombstone['deleted_at'], tombstone['_id'], None) for tombstone in tombstones],
+        key=lambda row: row[:2],
+    )
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    last = rows[-1][:2] if rows else None
+    next_pos = next_position(position, last, has_more)
+    return (
+        [tyre for _, _, tyre in rows if tyre is not None],
+        [tyre_id for _, tyre_id, tyre in rows if tyre is None],
+        next_pos,
+        has_more,
+    )
+
+
+class ChangeFollower:
+    """Keeps in-process indexes in step with the tyres collection.
+
+    Each index provides upsert(tyre_doc) and remove(tyre_id). Writes made
+    by this process are applied straight away; writes made by other
+    workers arrive through the changes feed on the next sync.
+    """
+
+    def __init__(self, indexes: List, page_size: int = 1000):
+        self.indexes = indexes
+        self.page_size = page_size
+        self.position: Optional[Position] = None
+
+    def upsert(self, tyre: dict) -> None:
+        for index in self.indexes:
+            index.upsert(tyre)
+
+    def remove(self, tyre_id) -> None:
+        for index in self.indexes:
+            index.remove(str(tyre_id))
+
+    async def sync(self, db) -> None:
+        """Apply everything in the feed after the last position seen"""
+        has_more = True
+        while has_more:
+            tyres, deleted, position, has_more = await fetch_changes(db, self.position, self.page_size)
+            for tyre in tyres:
+                self.upsert(tyre)
+            for tyre_id in deleted:
+                self.remove(tyre_id)
+            self.position = position
+
+    async def follow(self, db, interval: float) -> None:
+        """Background task: sync every `interval` seconds until cancelled"""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.sync(db)
+            except Exception:
+                logger.exception("Index sync failed")
@@ -0,0 +1,211 @@
+"""Columnar in-memory copy of the tyres collection for fast filtered reads.
+
+Text columns are dictionary-encoded (one int32 code per row plus a small
+list of distinct values); numbers live in typed NumPy arrays. Filters are
+evaluated as vectorised boolean masks, and text prefix filters are first
+resolved against the dictionary, which only holds distinct values.
+Deleted rows are marked dead and their slots reused.
+"""
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from tyre_keys import brand_key, pattern_key, size_key
+
+TEXT_COLUMNS = ('brand', 'size', 'type', 'pattern')
+NUMBER_COLUMNS = {
+    'stock': np.int64,
+    'price': np.float64,
+    'width': np.float64,
+    'aspect': np.float64,
+    'rim': np.float64,
+}
+TIME_COLUMNS = ('created_at', 'updated_at')
+MISSING_TIME = np.datetime64('NaT', 'ms')
+
+
+def _extended(column: np.ndarray, extra: int, fill) -> np.ndarray:
+    return np.concatenate([column, np.full(extra, fill, dtype=column.dtype)])
+
+
+class Dictionary:
+    """Distinct values of a text column and their integer codes"""
+
+    def __init__(self):
+        self.values: List[str] = []
+        self.codes: Dict[str, int] = {}
+
+    def encode(self, value: str) -> int:
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def matching(self, predicate) -> np.ndarray:
+        """Codes of the values accepted by predicate"""
+        return np.array(
+            [code for code, value in enumerate(self.values) if predicate(value)],
+            dtype=np.int32,
+        )
+
+
+class ColumnStore:
+    def __init__(self, capacity: int = 1024):
+        self.capacity = capacity
+        self.ids: List[Optional[str]] = [None] * capacity
+        self.slots: Dict[str, int] = {}
+        self.free: List[int] = []
+        self.size = 0  # slots in use, including dead ones
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.dictionaries = {name: Dictionary() for name in TEXT_COLUMNS}
+        self.text = {name: np.zeros(capacity, dtype=np.int32) for name in TEXT_COLUMNS}
+        self.numbers = {name: np.zeros(capacity, dtype=dtype) for name, dtype in NUMBER_COLUMNS.items()}
+        self.times = {name: np.full(capacity, MISSING_TIME) for name in TIME_COLUMNS}
+
+    def __len__(self) -> int:
+        return len(self.slots)
+
+    def _grow(self) -> None:
+        """Double the capacity of every column"""
+        extra = self.capacity
+        self.capacity += extra
+        self.ids.extend([None] * extra)
+        self.alive = _extended(self.alive, extra, False)
+        for name, column in self.text.items():
+            self.text[name] = _extended(column, extra, 0)
+        for name, column in self.numbers.items():
+            self.numbers[name] = _extended(column, extra, 0)
+        for name, column in self.times.items():
+            self.times[name] = _extended(column, extra, MISSING_TIME)
+
+    def upsert(self, tyre: dict) -> None:
+        tyre_id = str(tyre.get('_id') or tyre['id'])
+        slot = self.slots.get(tyre_id)
+        if slot is None:
+            if self.free:
+                slot = self.free.pop()
+            else:
+                if self.size == self.capacity:
+                    self._grow()
+                slot = self.size
+                self.size += 1
+            self.slots[tyre_id] = slot
+            self.ids[slot] = tyre_id
+            self.alive[slot] = True
+
+        for name in TEXT_COLUMNS:
+            self.text[name][slot] = self.dictionaries[name].encode(tyre[name])
+        for name in NUMBER_COLUMNS:
+            value = tyre.get(name)
+            if value is None:
+                # Unparsed size fields are NaN so they never match a range
+                value = 0 if name in ('stock', 'price') else np.nan
+            self.numbers[name][slot] = value
+        for name in TIME_COLUMNS:
+            value = tyre.get(name)
+            self.times[name][slot] = np.datetime64(value, 'ms') if value else MISSING_TIME
+
+    def remove(self, tyre_id: str) -> None:
+        slot = self.slots.pop(tyre_id, None)
+        if slot is not None:
+            self.alive[slot] = False
+            self.ids[slot] = None
+            self.free.append(slot)
+
+    def _text_mask(self, column: str, predicate) -> np.ndarray:
+        codes = self.dictionaries[column].matching(predicate)
+        return np.isin(self.text[column][:self.size], codes)
+
+    def _range_mask(self, column: str, low=None, high=None) -> np.ndarray:
+        values = self.numbers[column][:self.size]
+        mask = np.ones(self.size, dtype=bool)
+        if low is not None:
+            mask &= values >= low
+        if high is not None:
+            mask &= values <= high
+        return mask
+
+    def query(
+        self,
+        brand: Optional[str] = None,
+        size: Optional[str] = None,
+        pattern: Optional[str] = None,
+        min_rim: Optional[float] = None,
+        max_rim: Optional[float] = None,
+        min_width: Optional[float] = None,
+        max_width: Optional[float] = None,
+        aspect: Optional[int] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        max_stock: Optional[int] = None,
+    ) -> np.ndarray:
+        """Slots of the live rows matching every given filter, in slot order.
+
+        brand, size and pattern are prefix matches on their normalised keys,
+        as in search_tyres; the rest are inclusive ranges.
+        """
+        mask = self.alive[:self.size].copy()
+        if brand:
+            prefix = brand_key(brand)
+            mask &= self._text_mask('brand', lambda value: brand_key(value).startswith(prefix))
+        if size:
+            prefix = size_key(size)
+            mask &= self._text_mask('size', lambda value: size_key(value).startswith(prefix))
+        if pattern:
+            prefix = pattern_key(pattern)
+            mask &= self._text_mask('pattern', lambda value: pattern_key(value).startswith(prefix))
+        if min_rim is not None or max_rim is not None:
+            mask &= self._range_mask('rim', min_rim, max_rim)
+        if min_width is not None or max_width is not None:
+            mask &= self._range_mask('width', min_width, max_width)
+        if aspect is not None:
+            mask &= self._range_mask('aspect', aspect, aspect)
+        if min_price is not None or max_price is not None:
+            mask &= self._range_mask('price', min_price, max_price)
+        if max_stock is not None:
+            mask &= self._range_mask('stock', high=max_stock)
+        return np.flatnonzero(mask)
+
+    def page(self, slots: np.ndarray, after: Optional[str], limit: int) -> np.ndarray:
+        """Up to limit of the given slots in id order, starting after id
+        `after`, like keyset paging on _id (ObjectId hex strings sort in
+        the same order as the ids)"""
+        ids = [(self.ids[slot], slot) for slot in slots.tolist()]
+        ids.sort()
+        if after is not None:
+            ids = [(tyre_id, slot) for tyre_id, slot in ids if tyre_id > after]
+        return np.array([slot for _, slot in ids[:limit]], dtype=np.intp)
+
+    def rows(self, slots: np.ndarray) -> List[dict]:
+        """Tyre dicts (the public Tyre fields) for the given slots"""
+        columns = {
+            name: [self.dictionaries[name].values[code] for code in self.text[name][slots]]
+            for name in TEXT_COLUMNS
+        }
+        columns['stock'] = self.numbers['stock'][slots].tolist()
+        columns['price'] = self.numbers['price'][slots].tolist()
+        for name in TIME_COLUMNS:
+            columns[name] = [
+                value.isoformat() if isinstance(value, datetime) else None
+                for value in self.times[name][slots].astype('datetime64[us]').tolist()
+            ]
+        ids = [self.ids[slot] for slot in slots]
+        return [
+            {
+                'id': tyre_id,
+                'brand': brand,
+                'size': size,
+                'type': type_,
+                'pattern': pattern,
+                'stock': stock,
+                'price': price,
+                'created_at': created_at,
+                'updated_at': updated_at,
+            }
+            for tyre_id, brand, size, type_, pattern, stock, price, created_at, updated_at in zip(
+                ids, columns['brand'], columns['size'], columns['type'], columns['pattern'],
+                columns['stock'], columns['price'], columns['created_at'], columns['updated_at'],
+            )
+        ]
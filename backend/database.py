@@ -0,0 +1,123 @@
+"""MongoDB client settings, pool warm-up and index creation.
+
+Pool size and timeouts come from the environment so each deployment can
+size them to its worker count:
+
+    MONGO_MAX_POOL_SIZE                 connections per worker (default 100)
+    MONGO_MIN_POOL_SIZE                 connections opened at startup (default 10)
+    MONGO_MAX_IDLE_TIME_MS              idle connections are closed after this (default 300000)
+    MONGO_CONNECT_TIMEOUT_MS            TCP connect and TLS handshake (default 5000)
+    MONGO_SERVER_SELECTION_TIMEOUT_MS   wait for a usable server (default 5000)
+    MONGO_WAIT_QUEUE_TIMEOUT_MS         wait for a free pooled connection (default 2000)
+
+Read-only routes use a second database handle with its own read
+preference, so list and search traffic can be served by secondaries while
+writes stay on the primary:
+
+    MONGO_READ_PREFERENCE               primary, primaryPreferred, secondary,
+                                        secondaryPreferred (default) or nearest
+    MONGO_MAX_STALENESS_SECONDS         skip secondaries lagging more than this
+                                        (default 90, the lowest MongoDB allows; -1 for no limit)
+"""
+import asyncio
+import os
+from typing import List
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import IndexModel
+from pymongo.errors import OperationFailure
+from pymongo.read_preferences import (
+    Nearest,
+    Primary,
+    PrimaryPreferred,
+    Secondary,
+    SecondaryPreferred,
+)
+
+from changes import TOMBSTONE_INDEXES, TYRE_CHANGE_INDEXES
+from stock_ledger import MOVEMENT_INDEXES, PENDING_MOVEMENTS_INDEX
+from tyre_keys import NATURAL_KEY_INDEX, SEARCH_INDEXES
+
+# Every index a route or background task relies on, per collection: key
+# lists, or IndexModels for indexes with options
+INDEXES = {
+    'tyres': [NATURAL_KEY_INDEX] + SEARCH_INDEXES + TYRE_CHANGE_INDEXES + [PENDING_MOVEMENTS_INDEX],
+    'tyre_tombstones': TOMBSTONE_INDEXES,
+    'stock_movements': MOVEMENT_INDEXES,
+}
+
+# IndexOptionsConflict, IndexKeySpecsConflict
+INDEX_CONFLICTS = (85, 86)
+
+READ_PREFERENCES = {
+    'primaryPreferred': PrimaryPreferred,
+    'secondary': Secondary,
+    'secondaryPreferred': SecondaryPreferred,
+    'nearest': Nearest,
+}
+
+
+def _env_int(name: str, default: int) -> int:
+    return int(os.environ.get(name, default))
+
+
+def pool_options() -> dict:
+    """Connection pool settings for AsyncIOMotorClient"""
+    return {
+        'maxPoolSize': _env_int('MONGO_MAX_POOL_SIZE', 100),
+        'minPoolSize': _env_int('MONGO_MIN_POOL_SIZE', 10),
+        'maxIdleTimeMS': _env_int('MONGO_MAX_IDLE_TIME_MS', 300000),
+        'connectTimeoutMS': _env_int('MONGO_CONNECT_TIMEOUT_MS', 5000),
+        'serverSelectionTimeoutMS': _env_int('MONGO_SERVER_SELECTION_TIMEOUT_MS', 5000),
+        'waitQueueTimeoutMS': _env_int('MONGO_WAIT_QUEUE_TIMEOUT_MS', 2000),
+    }
+
+
+def create_client(mongo_url: str, listeners: List = ()) -> AsyncIOMotorClient:
+    """The client does not connect until it is first used"""
+    return AsyncIOMotorClient(mongo_url, event_listeners=list(listeners), **pool_options())
+
+
+def read_preference():
+    """Read preference for the read handle, from the environment"""
+    mode = os.environ.get('MONGO_READ_PREFERENCE', 'secondaryPreferred')
+    if mode == 'primary':
+        # The primary is never stale, so it takes no staleness bound
+        return Primary()
+    if mode not in READ_PREFERENCES:
+        raise ValueError(f"Unknown MONGO_READ_PREFERENCE: {mode}")
+    return READ_PREFERENCES[mode](max_staleness=_env_int('MONGO_MAX_STALENESS_SECONDS', 90))
+
+
+def read_database(client: AsyncIOMotorClient, name: str):
+    """Handle on the same database that sends reads by read_preference()"""
+    return client.get_database(name, read_preference=read_preference())
+
+
+async def warm_up(client: AsyncIOMotorClient, connections: int) -> None:
+    """Open `connections` pooled connections by running that many pings at once.
+
+    minPoolSize alone fills the pool in the background, so the first
+    requests after a restart could still pay for the handshakes.
+    """
+    await asyncio.gather(*(client.admin.command('ping') for _ in range(max(connections, 1))))
+
+
+async def ensure_indexes(db) -> None:
+    """Create any missing index; existing ones are a no-op on the server.
+
+    An existing index on the same keys with other options (one that has
+    since become unique or TTL) is dropped and built again.
+    """
+    for collection, indexes in INDEXES.items():
+        for index in indexes:
+            if isinstance(index, IndexModel):
+                try:
+                    await db[collection].create_indexes([index])
+                except OperationFailure as e:
+                    if e.code not in INDEX_CONFLICTS:
+                        raise
+                    await db[collection].drop_index(index.document['name'])
+                    await db[collection].create_indexes([index])
+            else:
+                await db[collection].create_index(index)
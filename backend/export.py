@@ -0,0 +1,59 @@
+"""CSV and XLSX encoders for GET /api/tyres/export.
+
+Both read tyres from an async cursor batch by batch, so memory use does
+not grow with the catalogue. CSV is sent as it is written, in chunks of
+about CSV_CHUNK_SIZE bytes. An XLSX file is a zip archive that can only
+be finished once every row is known, so rows go to an openpyxl
+write-only workbook (which spools them to disk) and the file is sent
+when it is complete.
+"""
+import asyncio
+import csv
+import io
+import tempfile
+from datetime import datetime
+from typing import AsyncIterator, List
+
+CSV_MEDIA_TYPE = 'text/csv; charset=utf-8'
+XLSX_MEDIA_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+CSV_CHUNK_SIZE = 64 * 1024
+FILE_CHUNK_SIZE = 64 * 1024
+
+
+def cell(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+async def csv_chunks(cursor, fields: List[str]) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    async for tyre in cursor:
+        writer.writerow([cell(tyre.get(field)) for field in fields])
+        if buffer.tell() >= CSV_CHUNK_SIZE:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode()
+
+
+async def xlsx_chunks(cursor, fields: List[str]) -> AsyncIterator[bytes]:
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Tyres')
+    sheet.append(fields)
+    async for tyre in cursor:
+        sheet.append([tyre.get(field) for field in fields])
+
+    loop = asyncio.get_running_loop()
+    with tempfile.TemporaryFile() as file:
+        # Zipping the sheet is CPU-bound; keep it off the event loop
+        await loop.run_in_executor(None, workbook.save, file)
+        file.seek(0)
+        while True:
+            chunk = await loop.run_in_executor(None, file.read, FILE_CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
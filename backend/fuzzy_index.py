@@ -0,0 +1,95 @@
+"""In-memory trigram index for typo-tolerant brand/pattern search.
+
+Price lists spell the same pattern several ways (NYLOGRIP/NAYLOGRIP,
+SEC.ZOOM/SEC ZOOM, SECURALYFE/SEURALYEF). Text is normalised to lower-case
+letters and digits and split into trigrams; a query is scored against
+each distinct (brand, pattern) pair by the share of its trigrams found
+there. Postings point at pairs rather than tyres, so lookups touch the
+pattern vocabulary, not the whole catalogue.
+"""
+import re
+from collections import Counter, defaultdict
+from typing import Dict, List, Set, Tuple
+
+NON_ALNUM = re.compile(r'[^a-z0-9]+')
+
+Entry = Tuple[str, str]  # (normalised brand, normalised pattern)
+
+
+def normalise(text: str) -> str:
+    return NON_ALNUM.sub('', text.lower())
+
+
+def trigrams(text: str) -> Set[str]:
+    """Trigrams of normalised text, padded so short words still match"""
+    padded = f"$${normalise(text)}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)} if len(padded) > 3 else set()
+
+
+class TrigramIndex:
+    def __init__(self):
+        self.postings: Dict[str, Set[Entry]] = defaultdict(set)
+        self.entry_grams: Dict[Entry, Set[str]] = {}
+        self.entry_tyres: Dict[Entry, Set[str]] = defaultdict(set)
+        self.tyre_entries: Dict[str, Entry] = {}
+
+    def __len__(self) -> int:
+        return len(self.tyre_entries)
+
+    def upsert(self, tyre: dict) -> None:
+        tyre_id = str(tyre.get('_id') or tyre['id'])
+        entry = (normalise(tyre['brand']), normalise(tyre['pattern']))
+        if self.tyre_entries.get(tyre_id) == entry:
+            return
+        self.remove(tyre_id)
+        if entry not in self.entry_grams:
+            grams = trigrams(entry[0]) | trigrams(entry[1])
+            self.entry_grams[entry] = grams
+            for gram in grams:
+                self.postings[gram].add(entry)
+        self.entry_tyres[entry].add(tyre_id)
+        self.tyre_entries[tyre_id] = entry
+
+    def remove(self, tyre_id: str) -> None:
+        entry = self.tyre_entries.pop(tyre_id, None)
+        if entry is None:
+            return
+        tyres = self.entry_tyres[entry]
+        tyres.discard(tyre_id)
+        if not tyres:
+            # Last tyre with this brand/pattern: drop it from the postings
+            del self.entry_tyres[entry]
+            for gram in self.entry_grams.pop(entry):
+                self.postings[gram].discard(entry)
+                if not self.postings[gram]:
+                    del self.postings[gram]
+
+    def search(self, query: str, limit: int = 20, min_score: float = 0.4) -> List[Tuple[str, float]]:
+        """Tyre ids ranked by similarity to the query, best first.
+
+        The score is the fraction of the query's trigrams an entry contains;
+        ties go to the entry with fewer extra trigrams (the closer spelling).
+        """
+        query_grams = trigrams(query)
+        if not query_grams:
+            return []
+
+        shared = Counter()
+        for gram in query_grams:
+            shared.update(self.postings.get(gram, ()))
+
+        ranked = []
+        for entry, count in shared.items():
+            score = count / len(query_grams)
+            if score >= min_score:
+                jaccard = count / (len(query_grams) + len(self.entry_grams[entry]) - count)
+                ranked.append((score, jaccard, entry))
+        ranked.sort(key=lambda item: (item[0], item[1]), reverse=True)
+
+        results = []
+        for score, _, entry in ranked:
+            for tyre_id in sorted(self.entry_tyres[entry]):
+                results.append((tyre_id, round(score, 3)))
+                if len(results) >= limit:
+                    return results
+        return results
@@ -1,12 +1,40 @@
+"""Import tyres from a supplier price list (CSV or XLSX) or the built-in sample.
+
+    python import_tyres.py [prices.csv|prices.xlsx] [--chunk-size N]
+
+Rows are upserted on the natural key (brand, size, type, pattern), so the
+catalogue stays readable throughout the import. The file is read and
+parsed chunk by chunk in a separate process while this process writes
+the previous chunk with an unordered bulk_write.
+"""
 import os
+import sys
+import time
 import asyncio
+import argparse
+import multiprocessing
+from datetime import datetime
 from motor.motor_asyncio import AsyncIOMotorClient
 from dotenv import load_dotenv
 from pathlib import Path
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from catalog import bump_catalog_version
+from database import ensure_indexes
+from stock_ledger import DUPLICATE_KEY, record_counts
+from summary import reconcile_summary
+from tyre_keys import NATURAL_KEY, search_keys
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
+REQUIRED_COLUMNS = set(NATURAL_KEY) | {'price'}
+DEFAULT_CHUNK_SIZE = 2000
+
+# Parsed chunks waiting to be written; bounds the importer's memory
+MAX_PENDING_CHUNKS = 4
+
 # Sample tyre data from the Excel file
 TYRE_DATA = [
     # MRF Tyres
@@ -189,32 +217,198 @@ TYRE_DATA = [
     {"brand": "CEAT", "size": "300*10", "type": "TL", "pattern": "ER/EV (E/F+150)", "stock": 0, "price": 1200},
 ]
 
-async def import_data():
+def read_rows(path: str, chunk_size: int):
+    """Yield lists of raw row dicts from a CSV or XLSX file, chunk by chunk"""
+    if path.lower().endswith(('.xlsx', '.xlsm')):
+        # openpyxl's read-only mode streams rows instead of loading the workbook
+        from openpyxl import load_workbook
+        workbook = load_workbook(path, read_only=True, data_only=True)
+        rows = workbook.active.iter_rows(values_only=True)
+        header = [str(cell or '').strip().lower() for cell in next(rows, ())]
+        chunk = []
+        for row in rows:
+            chunk.append(dict(zip(header, row)))
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+        workbook.close()
+    else:
+        import pandas as pd
+        reader = pd.read_csv(path, dtype=str, keep_default_na=False, chunksize=chunk_size)
+        for frame in reader:
+            frame.columns = [str(column).strip().lower() for column in frame.columns]
+            yield frame.to_dict('records')
+
+
+def parse_row(row: dict) -> dict:
+    """Validate one price-list row; raises ValueError for unusable rows"""
+    tyre = {field: str(row.get(field) or '').strip() for field in NATURAL_KEY}
+    if not tyre['brand'] or not tyre['size']:
+        raise ValueError("missing brand or size")
+    tyre['price'] = float(str(row['price']).replace(',', ''))
+    stock = row.get('stock')
+    if stock not in (None, ''):
+        tyre['stock'] = int(float(stock))
+    return tyre
+
+
+def natural_key(tyre: dict) -> tuple:
+    return tuple(tyre[field] for field in NATURAL_KEY)
+
+
+def upsert_operation(tyre: dict, now: datetime) -> UpdateOne:
+    """Upsert on the natural key; stock is only set when the file has it"""
+    fields = {**tyre, **search_keys(tyre), 'updated_at': now}
+    update = {'$set': fields, '$setOnInsert': {'created_at': now}}
+    if 'stock' not in tyre:
+        update['$setOnInsert']['stock'] = 0
+    return UpdateOne({field: tyre[field] for field in NATURAL_KEY}, update, upsert=True)
+
+
+async def upsert_tyres(db, tyres: list, now: datetime) -> dict:
+    """Upsert the tyres with one unordered bulk_write; returns the _id of
+    each inserted tyre by its index in tyres.
+
+    A row whose insert lost the race with another writer inserting the
+    same natural key fails on the unique index; it is retried, and now
+    updates the tyre the other writer inserted.
+    """
+    operations = [upsert_operation(tyre, now) for tyre in tyres]
+    try:
+        result = await db.tyres.bulk_write(operations, ordered=False)
+        return result.upserted_ids
+    except BulkWriteError as e:
+        errors = e.details['writeErrors']
+        if any(error['code'] != DUPLICATE_KEY for error in errors):
+            raise
+        await db.tyres.bulk_write([operations[error['index']] for error in errors], ordered=False)
+        return {upserted['index']: upserted['_id'] for upserted in e.details['upserted']}
+
+
+async def counted_stock(db, tyres: list) -> dict:
+    """Current _id and stock of the existing tyres whose row has a stock"""
+    keys = [{field: tyre[field] for field in NATURAL_KEY} for tyre in tyres if 'stock' in tyre]
+    if not keys:
+        return {}
+    existing = await db.tyres.find(
+        {'$or': keys}, {**dict.fromkeys(NATURAL_KEY, 1), 'stock': 1}
+    ).to_list(None)
+    return {natural_key(tyre): tyre for tyre in existing}
+
+
+def parse_file(path: str, chunk_size: int, queue) -> None:
+    """Worker process: parse the file and hand (tyres, skipped) chunks to the queue"""
+    try:
+        for rows in read_rows(path, chunk_size):
+            if rows and not REQUIRED_COLUMNS <= rows[0].keys():
+                missing = ', '.join(sorted(REQUIRED_COLUMNS - rows[0].keys()))
+                raise ValueError(f"missing columns: {missing}")
+            tyres, skipped = [], 0
+            for row in rows:
+                try:
+                    tyres.append(parse_row(row))
+                except (ValueError, TypeError, KeyError):
+                    skipped += 1
+            queue.put((tyres, skipped))
+        queue.put(None)
+    except Exception as e:
+        queue.put(e)
+
+
+async def upsert_chunks(db, chunks) -> tuple:
+    """Write each parsed chunk with one unordered bulk_write.
+
+    Stock figures from the file are stock counts, so they are also
+    recorded in the stock ledger, as deltas from the stock read just
+    before the write.
+    """
+    written = skipped = 0
+    async for tyres, chunk_skipped in chunks:
+        skipped += chunk_skipped
+        if tyres:
+            # Unordered upserts of the same key could both insert; keep the last row
+            tyres = list({natural_key(tyre): tyre for tyre in tyres}.values())
+            before = await counted_stock(db, tyres)
+            now = datetime.utcnow()
+            upserted_ids = await upsert_tyres(db, tyres, now)
+            written += len(tyres)
+
+            counts = []
+            for index, tyre in enumerate(tyres):
+                if 'stock' not in tyre:
+                    continue
+                existing = before.get(natural_key(tyre))
+                if existing is not None:
+                    counts.append((existing, {'_id': existing['_id'], 'stock': tyre['stock']}))
+                elif index in upserted_ids:
+                    counts.append(({}, {'_id': upserted_ids[index], 'stock': tyre['stock']}))
+            await record_counts(db, counts)
+    return written, skipped
+
+
+async def file_chunks(path: str, chunk_size: int):
+    """Parsed chunks from a worker process, without blocking the event loop"""
+    loop = asyncio.get_running_loop()
+    queue = multiprocessing.Queue(MAX_PENDING_CHUNKS)
+    worker = multiprocessing.Process(target=parse_file, args=(path, chunk_size, queue), daemon=True)
+    worker.start()
+    try:
+        while True:
+            chunk = await loop.run_in_executor(None, queue.get)
+            if chunk is None:
+                break
+            if isinstance(chunk, Exception):
+                raise chunk
+            yield chunk
+    finally:
+        worker.join(timeout=1)
+        if worker.is_alive():
+            worker.terminate()
+
+
+async def sample_chunks(chunk_size: int):
+    """Chunks of TYRE_DATA; its placeholder stock is only used for new rows"""
+    for start in range(0, len(TYRE_DATA), chunk_size):
+        chunk = TYRE_DATA[start:start + chunk_size]
+        yield [{k: v for k, v in tyre.items() if k != 'stock'} for tyre in chunk], 0
+
+
+async def import_data(path: str = None, chunk_size: int = DEFAULT_CHUNK_SIZE):
     # Connect to MongoDB
     mongo_url = os.environ['MONGO_URL']
     client = AsyncIOMotorClient(mongo_url)
     db = client[os.environ['DB_NAME']]
+
+    # The natural-key index keeps each upsert an index lookup
+    await ensure_indexes(db)
+
+    started = time.monotonic()
+    chunks = file_chunks(path, chunk_size) if path else sample_chunks(chunk_size)
+    written, skipped = await upsert_chunks(db, chunks)
+    elapsed = time.monotonic() - started
+    await bump_catalog_version(db)
+
+    rate = written / elapsed if elapsed else 0
+    print(f"Imported {written} tyres in {elapsed:.2f}s ({rate:,.0f} rows/s)")
+    if skipped:
+        print(f"Skipped {skipped} rows with missing or invalid fields")
     
-    # Clear existing data
-    await db.tyres.delete_many({})
-    print("Cleared existing tyre data")
-    
-    # Insert new data
-    result = await db.tyres.insert_many(TYRE_DATA)
-    print(f"Imported {len(result.inserted_ids)} tyres successfully!")
-    
-    # Show summary
-    pipeline = [
-        {"$group": {"_id": "$brand", "count": {"$sum": 1}}},
-        {"$sort": {"_id": 1}}
-    ]
-    summary = await db.tyres.aggregate(pipeline).to_list(100)
-    
+    # Bulk upserts do not maintain the brand summaries; rebuild them
+    summary = await reconcile_summary(db)
+
     print("\nImport Summary:")
     for item in summary:
-        print(f"  {item['_id']}: {item['count']} items")
+        print(f"  {item['_id']}: {item['skus']} items, {item['units']} units")
     
     client.close()
 
 if __name__ == "__main__":
-    asyncio.run(import_data())
+    parser = argparse.ArgumentParser(description="Import tyres into the inventory")
+    parser.add_argument('path', nargs='?', help="CSV or XLSX price list (default: built-in sample)")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args()
+    if args.path and not Path(args.path).exists():
+        sys.exit(f"No such file: {args.path}")
+    asyncio.run(import_data(args.path, args.chunk_size))
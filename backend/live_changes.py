@@ -0,0 +1,184 @@
+"""Tyre changes pushed to connected clients over /api/tyres/live.
+
+ChangeBroadcaster reads one MongoDB change stream on `tyres` per process
+and fans every insert, update and delete out to the connected clients,
+encoding each event once. Events carry the stream's resume token, which
+names a point in the oplog and so is the same on every process. The last
+`replay_size` events are kept, so a client that reconnects with the token
+of the last event it saw is sent exactly what it missed; a client whose
+token is no longer held is told to reload instead.
+
+Each client has a queue of at most `queue_size` events. A client that
+falls that far behind is disconnected rather than buffered without limit
+or allowed to hold up the others, and catches up from its token when it
+reconnects.
+
+Change streams need a replica set or sharded cluster; on a standalone
+server live updates are switched off.
+"""
+import asyncio
+import logging
+from collections import deque
+from contextlib import suppress
+from typing import AsyncIterator, Deque, List, Optional, Set, Tuple
+
+import orjson
+from pymongo.errors import OperationFailure
+
+from metrics import registry
+
+registry.describe('live_events_total', "Tyre changes read from the change stream")
+registry.describe('live_clients_dropped_total', "Live clients disconnected for falling behind")
+
+# Server error codes
+CHANGE_STREAM_UNSUPPORTED = 40573  # not a replica set
+CHANGE_STREAM_HISTORY_LOST = 286  # the resume token has left the oplog
+
+RESET_MESSAGE = orjson.dumps({'type': 'reset'}).decode()
+
+logger = logging.getLogger(__name__)
+
+
+def encode(token: str, change: dict) -> Optional[str]:
+    """Client message for a change event, or None for an update whose
+    tyre was deleted before it could be looked up (its delete follows)"""
+    tyre_id = str(change['documentKey']['_id'])
+    if change['operationType'] == 'delete':
+        return orjson.dumps({'type': 'delete', 'token': token, 'id': tyre_id}).decode()
+    tyre = change.get('fullDocument')
+    if tyre is None:
+        return None
+    return orjson.dumps({'type': 'upsert', 'token': token, 'tyre': {'id': tyre_id, **tyre}}).decode()
+
+
+class Subscriber:
+    """One connected client: messages to catch up on, then its queue"""
+
+    def __init__(self, backlog: List[str], queue_size: int):
+        self.backlog = backlog
+        self.queue: asyncio.Queue = asyncio.Queue(queue_size)
+        self.dropped = False
+
+    async def messages(self) -> AsyncIterator[str]:
+        """Messages to send, in order, until the subscriber is dropped"""
+        for message in self.backlog:
+            yield message
+        self.backlog = []
+        while True:
+            message = await self.queue.get()
+            if self.dropped:
+                return
+            yield message
+
+
+class ChangeBroadcaster:
+    def __init__(self, fields: List[str], replay_size: int, queue_size: int, retry_interval: float = 5):
+        self.pipeline = [
+            {'$match': {'operationType': {'$in': ['insert', 'update', 'replace', 'delete']}}},
+            # Updates that leave updated_at alone, such as moving stock
+            # movements to the ledger, change no public field
+            {'$match': {'$or': [
+                {'operationType': {'$ne': 'update'}},
+                {'updateDescription.updatedFields.updated_at': {'$exists': True}},
+            ]}},
+            {'$project': {
+                'operationType': 1,
+                'documentKey': 1,
+                **{f'fullDocument.{field}': 1 for field in fields if field != 'id'},
+            }},
+        ]
+        self.queue_size = queue_size
+        self.retry_interval = retry_interval
+        # (token, message) for recent events; None marks where the stream was opened
+        self.events: Deque[Tuple[str, Optional[str]]] = deque(maxlen=replay_size)
+        self.token: Optional[str] = None
+        self.subscribers: Set[Subscriber] = set()
+
+    def subscribe(self, after: Optional[str] = None) -> Subscriber:
+        """Register a client that has seen everything up to token `after`.
+
+        It is sent the events it missed (or a reset when they are no longer
+        held), then a ready message with the token it is now at.
+        """
+        backlog = []
+        if after is not None and after != self.token:
+            tokens = [token for token, _ in self.events]
+            if after in tokens:
+                missed = list(self.events)[tokens.index(after) + 1:]
+                backlog = [message for _, message in missed if message is not None]
+            else:
+                backlog = [RESET_MESSAGE]
+        backlog.append(orjson.dumps({'type': 'ready', 'token': self.token}).decode())
+
+        subscriber = Subscriber(backlog, self.queue_size)
+        self.subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        self.subscribers.discard(subscriber)
+
+    def drop(self, subscriber: Subscriber) -> None:
+        """Stop sending to a subscriber; its messages() ends"""
+        subscriber.dropped = True
+        self.subscribers.discard(subscriber)
+        with suppress(asyncio.QueueFull):
+            # Wake it if it is waiting on an empty queue
+            subscriber.queue.put_nowait(None)
+
+    def publish(self, token: str, message: Optional[str]) -> None:
+        self.token = token
+        self.events.append((token, message))
+        if message is None:
+            return
+        for subscriber in list(self.subscribers):
+            try:
+                subscriber.queue.put_nowait(message)
+            except asyncio.QueueFull:
+                registry.increment('live_clients_dropped_total', ())
+                self.drop(subscriber)
+
+    def close(self) -> None:
+        """Disconnect every client"""
+        for subscriber in list(self.subscribers):
+            self.drop(subscriber)
+
+    def restart(self) -> None:
+        """Forget the stream position; reconnecting clients will reload"""
+        self.token = None
+        self.events.clear()
+        self.close()
+
+    def opened(self, token: Optional[str]) -> None:
+        if token is not None and token != self.token:
+            self.token = token
+            self.events.append((token, None))
+
+    async def follow(self, collection) -> None:
+        """Background task: read the change stream until cancelled,
+        resuming from the last token after errors"""
+        while True:
+            resume_after = {'_data': self.token} if self.token else None
+            try:
+                async with collection.watch(
+                    self.pipeline, full_document='updateLookup', resume_after=resume_after,
+                ) as stream:
+                    self.opened((stream.resume_token or {}).get('_data'))
+                    async for change in stream:
+                        token = change['_id']['_data']
+                        registry.increment('live_events_total', ())
+                        self.publish(token, encode(token, change))
+                # The stream was invalidated (tyres was dropped or renamed)
+                self.restart()
+            except OperationFailure as e:
+                if e.code == CHANGE_STREAM_UNSUPPORTED:
+                    logger.warning("MongoDB does not support change streams here; live updates are off")
+                    return
+                if e.code == CHANGE_STREAM_HISTORY_LOST:
+                    logger.warning("Change stream fell off the oplog; live clients will reload")
+                    self.restart()
+                else:
+                    logger.exception("Change stream failed")
+                await asyncio.sleep(self.retry_interval)
+            except Exception:
+                logger.exception("Change stream failed")
+                await asyncio.sleep(self.retry_interval)
@@ -0,0 +1,151 @@
+"""Request and MongoDB timing metrics, exposed in Prometheus text format.
+
+MetricsMiddleware records a latency histogram and status counts per route
+template (/api/tyres/{tyre_id}, not every concrete URL). MongoCommandListener
+is a pymongo command listener recording database time per command and
+collection. Recording is a bisect and a few additions under a lock, so it
+can stay on in production.
+"""
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Dict, Tuple
+
+from pymongo import monitoring
+
+# Upper bounds in seconds, as for Prometheus' default histogram buckets
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)  # the last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect_left(BUCKETS, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms: Dict[str, Dict[Labels, Histogram]] = defaultdict(lambda: defaultdict(Histogram))
+        self.counters: Dict[str, Dict[Labels, int]] = defaultdict(lambda: defaultdict(int))
+        self.help: Dict[str, str] = {}
+
+    def observe(self, name: str, labels: Labels, seconds: float) -> None:
+        with self.lock:
+            self.histograms[name][labels].observe(seconds)
+
+    def increment(self, name: str, labels: Labels, amount: int = 1) -> None:
+        with self.lock:
+            self.counters[name][labels] += amount
+
+    def describe(self, name: str, text: str) -> None:
+        self.help[name] = text
+
+    def render(self) -> str:
+        """Everything recorded so far, in Prometheus text exposition format"""
+        lines = []
+        with self.lock:
+            for name, series in sorted(self.histograms.items()):
+                lines.append(f"# HELP {name} {self.help.get(name, name)}")
+                lines.append(f"# TYPE {name} histogram")
+                for labels, histogram in sorted(series.items()):
+                    cumulative = 0
+                    for bound, count in zip(BUCKETS + (float('inf'),), histogram.counts):
+                        cumulative += count
+                        le = '+Inf' if bound == float('inf') else repr(bound)
+                        lines.append(f"{name}_bucket{format_labels(labels + (('le', le),))} {cumulative}")
+                    lines.append(f"{name}_sum{format_labels(labels)} {histogram.sum}")
+                    lines.append(f"{name}_count{format_labels(labels)} {histogram.count}")
+            for name, series in sorted(self.counters.items()):
+                lines.append(f"# HELP {name} {self.help.get(name, name)}")
+                lines.append(f"# TYPE {name} counter")
+                for labels, value in sorted(series.items()):
+                    lines.append(f"{name}{format_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(labels: Labels) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{escape(value)}"' for key, value in labels) + '}'
+
+
+registry = MetricsRegistry()
+registry.describe('http_request_duration_seconds', "Request latency by route template")
+registry.describe('http_responses_total', "Responses by route template and status")
+registry.describe('mongo_command_duration_seconds', "MongoDB command time by command and collection")
+registry.describe('mongo_command_failures_total', "Failed MongoDB commands by command and collection")
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware, so streaming responses are timed to the last byte"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # The router stores the matched route in the shared scope
+            route = scope.get('route')
+            template = getattr(route, 'path', None) or '<unmatched>'
+            labels = (('method', scope['method']), ('route', template))
+            registry.observe('http_request_duration_seconds', labels, time.perf_counter() - started)
+            registry.increment('http_responses_total', labels + (('status', str(status)),))
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    """Records every command's duration; pymongo calls this from Motor's threads"""
+
+    def __init__(self):
+        self.pending: Dict[Tuple, Tuple[str, str]] = {}
+
+    def started(self, event):
+        collection = event.command.get(event.command_name)
+        if event.command_name == 'getMore':
+            collection = event.command.get('collection')
+        if not isinstance(collection, str):
+            collection = ''
+        self.pending[(event.connection_id, event.request_id)] = (event.command_name, collection)
+
+    def _finished(self, event, failed: bool):
+        command, collection = self.pending.pop(
+            (event.connection_id, event.request_id), (event.command_name, '')
+        )
+        labels = (('command', command), ('collection', collection))
+        registry.observe('mongo_command_duration_seconds', labels, event.duration_micros / 1e6)
+        if failed:
+            registry.increment('mongo_command_failures_total', labels)
+
+    def succeeded(self, event):
+        self._finished(event, failed=False)
+
+    def failed(self, event):
+        self._finished(event, failed=True)
@@ -0,0 +1,33 @@
+import os
+import asyncio
+from motor.motor_asyncio import AsyncIOMotorClient
+from dotenv import load_dotenv
+from pathlib import Path
+
+from catalog import bump_catalog_version
+from tyre_keys import SEARCH_INDEXES, backfill_search_keys
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+
+async def migrate():
+    # Connect to MongoDB
+    mongo_url = os.environ['MONGO_URL']
+    client = AsyncIOMotorClient(mongo_url)
+    db = client[os.environ['DB_NAME']]
+
+    # Add search keys and parsed size fields to existing tyres
+    updated = await backfill_search_keys(db.tyres)
+    print(f"Migrated {updated} tyres")
+    if updated:
+        await bump_catalog_version(db)
+
+    for keys in SEARCH_INDEXES:
+        await db.tyres.create_index(keys)
+    print("Search indexes are up to date")
+
+    client.close()
+
+if __name__ == "__main__":
+    asyncio.run(migrate())
@@ -0,0 +1,97 @@
+"""Catalogue-wide price revisions done inside MongoDB.
+
+A revision selects tyres by brand, type and size prefix and applies a
+rule (percentage change, rounding step, price floor) with update_many and
+an aggregation-pipeline update, so no documents are read by the app.
+Small revisions are one update_many. Large ones run as a job that walks
+the matching tyres in _id ranges, one update_many per range, recording
+its progress in `price_revisions`.
+"""
+from datetime import datetime
+from typing import Optional
+
+from bson import ObjectId
+
+from tyre_keys import brand_key, prefix_match, size_key
+
+
+def revision_filter(brand: Optional[str], type_: Optional[str], size: Optional[str]) -> dict:
+    """Tyres of exactly this brand and type whose size starts with `size`"""
+    query = {}
+    if brand:
+        query['brand_key'] = brand_key(brand)
+    if type_:
+        query['type'] = type_
+    if size:
+        query['size_key'] = prefix_match(size_key(size))
+    return query
+
+
+def price_update(percent: float, round_to: float, floor: Optional[float]) -> list:
+    """Pipeline update: price * (1 + percent/100), rounded to the nearest
+    multiple of round_to (0 leaves it unrounded), at least floor.
+
+    updated_at is the server's $$NOW, taken per update_many, so every
+    chunk of a long job lands inside the changes feed's safety window.
+    """
+    price = {'$multiply': ['$price', 1 + percent / 100]}
+    if round_to:
+        price = {'$multiply': [{'$round': [{'$divide': [price, round_to]}, 0]}, round_to]}
+    if floor is not None:
+        price = {'$max': [price, floor]}
+    return [{'$set': {'price': price, 'updated_at': '$$NOW'}}]
+
+
+async def create_job(db, revision: dict, total: int) -> ObjectId:
+    result = await db.price_revisions.insert_one({
+        **revision,
+        'status': 'running',
+        'total': total,
+        'matched': 0,
+        'modified': 0,
+        'started_at': datetime.utcnow(),
+        'finished_at': None,
+        'error': None,
+    })
+    return result.inserted_id
+
+
+async def finish_job(db, job_id: ObjectId, error: Optional[str] = None) -> None:
+    await db.price_revisions.update_one({'_id': job_id}, {'$set': {
+        'status': 'failed' if error else 'done',
+        'finished_at': datetime.utcnow(),
+        'error': error,
+    }})
+
+
+async def record_progress(db, job_id: ObjectId, result) -> None:
+    await db.price_revisions.update_one({'_id': job_id}, {'$inc': {
+        'matched': result.matched_count,
+        'modified': result.modified_count,
+    }})
+
+
+async def revise_prices(db, job_id: ObjectId, query: dict, update: list, chunk_size: Optional[int] = None) -> None:
+    """Apply the update with one update_many, or with chunk_size one
+    _id range of that many tyres at a time, recording progress after each.
+
+    Range bounds are found with an _id-only query, so still no tyre
+    documents are read.
+    """
+    if chunk_size is None:
+        await record_progress(db, job_id, await db.tyres.update_many(query, update))
+        return
+
+    last = None
+    while True:
+        chunk = dict(query)
+        if last is not None:
+            chunk['_id'] = {'$gt': last}
+        bounds = await db.tyres.find(chunk, {'_id': 1}).sort('_id', 1).skip(chunk_size - 1).limit(1).to_list(1)
+        if bounds:
+            chunk['_id'] = {**chunk.get('_id', {}), '$lte': bounds[0]['_id']}
+
+        await record_progress(db, job_id, await db.tyres.update_many(chunk, update))
+        if not bounds:
+            return
+        last = bounds[0]['_id']
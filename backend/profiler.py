@@ -0,0 +1,162 @@
+"""Slow-query profiler: explains slow reads and flags collection scans.
+
+SlowQueryProfiler is a pymongo command listener. When a find, aggregate,
+distinct or findAndModify takes longer than the threshold, the command is
+explained (queryPlanner verbosity, so nothing is executed) on a
+background thread, at most once per query shape. The winning plan is
+logged, with COLLSCAN and in-memory SORT stages called out, and the
+latest reports are kept for GET /debug/slow-queries.
+"""
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from pymongo import MongoClient, monitoring
+
+from metrics import registry
+
+PROFILED_COMMANDS = {'find', 'aggregate', 'distinct', 'findAndModify'}
+
+# Fields the driver or session adds to commands, which explain must not be
+# given: explain rejects a command carrying a readConcern, and maxTimeMS
+# belongs on the explain command itself
+DRIVER_FIELDS = {
+    'lsid', 'txnNumber', 'autocommit', 'startTransaction', 'cursor', 'readConcern', 'maxTimeMS',
+}
+
+# Stages worth an index: full scans and sorts done in memory
+FLAGGED_STAGES = {'COLLSCAN', 'SORT'}
+
+logger = logging.getLogger(__name__)
+registry.describe('mongo_slow_queries_total', "Commands slower than the profiler threshold")
+
+
+def query_shape(value):
+    """The value with literals replaced by their type, so similar queries match.
+
+    Lists of plain values ($in, $nin, ...) collapse to the types of their
+    items, so the same query with 3 or 3000 ids has one shape. Lists of
+    documents (pipelines, $or) keep one shape per item, in order.
+    """
+    if isinstance(value, dict):
+        return tuple(sorted((key, query_shape(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple)):
+        shapes = [query_shape(item) for item in value]
+        if all(isinstance(shape, str) for shape in shapes):
+            return ('[]',) + tuple(sorted(set(shapes)))
+        return tuple(shapes)
+    return type(value).__name__
+
+
+def explainable(command: dict) -> dict:
+    """The command without the $-fields and DRIVER_FIELDS added to it when sent"""
+    return {key: value for key, value in command.items()
+            if not key.startswith('$') and key not in DRIVER_FIELDS}
+
+
+def command_shape(command_name: str, command: dict) -> tuple:
+    """Shape of a command, keeping the collection it runs on literally"""
+    return (
+        command_name,
+        command.get(command_name),
+        query_shape({key: value for key, value in command.items() if key != command_name}),
+    )
+
+
+def plan_stages(plan: dict) -> List[str]:
+    """Stage names of a plan tree, root first"""
+    stages = [plan['stage']] if 'stage' in plan else []
+    for child in ('inputStage', 'queryPlan'):
+        if child in plan:
+            stages += plan_stages(plan[child])
+    for child in plan.get('inputStages', ()):
+        stages += plan_stages(child)
+    return stages
+
+
+def winning_plan(explain: dict) -> Optional[dict]:
+    """Winning plan of a find/distinct/findAndModify or aggregate explain"""
+    planner = explain.get('queryPlanner')
+    if planner is None:
+        for stage in explain.get('stages', ()):
+            if '$cursor' in stage:
+                planner = stage['$cursor'].get('queryPlanner')
+                break
+    return planner.get('winningPlan') if planner else None
+
+
+class SlowQueryProfiler(monitoring.CommandListener):
+    def __init__(self, mongo_url: str, threshold_ms: float, max_reports: int = 50):
+        self.mongo_url = mongo_url
+        self.threshold_micros = threshold_ms * 1000
+        self.pending: Dict[Tuple, Tuple[str, dict]] = {}
+        self.seen = set()
+        self.reports = deque(maxlen=max_reports)
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='explain')
+        self.explain_client: Optional[MongoClient] = None
+
+    def started(self, event):
+        if event.command_name in PROFILED_COMMANDS:
+            self.pending[(event.connection_id, event.request_id)] = (event.database_name, event.command)
+
+    def succeeded(self, event):
+        pending = self.pending.pop((event.connection_id, event.request_id), None)
+        if pending is None or event.duration_micros < self.threshold_micros:
+            return
+
+        database, command = pending
+        command = explainable(command)
+        labels = (('command', event.command_name), ('collection', str(command.get(event.command_name, ''))))
+        registry.increment('mongo_slow_queries_total', labels)
+
+        shape = (database, command_shape(event.command_name, command))
+        with self.lock:
+            if shape in self.seen:
+                return
+            self.seen.add(shape)
+        self.executor.submit(self.explain, database, event.command_name, command, event.duration_micros / 1000)
+
+    def failed(self, event):
+        self.pending.pop((event.connection_id, event.request_id), None)
+
+    def explain(self, database: str, command_name: str, command: dict, duration_ms: float) -> None:
+        """Runs on the profiler thread with its own client, which is not monitored"""
+        try:
+            if self.explain_client is None:
+                self.explain_client = MongoClient(self.mongo_url, maxPoolSize=1)
+            if 'pipeline' in command:
+                # aggregate only explains with a cursor argument
+                command = {**command, 'cursor': {}}
+            result = self.explain_client[database].command('explain', command, verbosity='queryPlanner')
+        except Exception:
+            logger.exception("Could not explain slow %s", command_name)
+            return
+
+        plan = winning_plan(result) or {}
+        stages = plan_stages(plan)
+        flagged = sorted(FLAGGED_STAGES.intersection(stages))
+        report = {
+            'at': datetime.utcnow().isoformat(),
+            'database': database,
+            'command': command,
+            'duration_ms': round(duration_ms, 2),
+            'stages': stages,
+            'flagged': flagged,
+            'winning_plan': plan,
+        }
+        self.reports.append(report)
+        logger.warning(
+            "Slow %s on %s (%.1f ms): plan %s%s",
+            command_name, command.get(command_name), duration_ms,
+            ' <- '.join(stages) or 'unknown',
+            f" [{', '.join(flagged)}]" if flagged else '',
+        )
+
+    def close(self) -> None:
+        self.executor.shutdown(wait=False)
+        if self.explain_client is not None:
+            self.explain_client.close()
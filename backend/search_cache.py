@@ -0,0 +1,66 @@
+"""Result cache and request coalescing for GET /api/tyres/search.
+
+Identical searches that arrive while one is already reading from MongoDB
+wait for that read instead of starting their own (single-flight). Results
+are then kept in a bounded LRU for a short TTL. Entries belong to a
+catalog version, so a write anywhere makes them unreachable; local writes
+also clear the cache outright.
+"""
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+from metrics import registry
+
+registry.describe('search_cache_requests_total', "Searches by cache outcome: hit, miss or coalesced")
+
+
+class SearchCache:
+    def __init__(self, max_entries: int = 256, ttl: float = 30.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries: OrderedDict = OrderedDict()  # (version, key) -> (expires, value)
+        self.in_flight: Dict[Tuple[int, Hashable], asyncio.Future] = {}
+
+    def _count(self, result: str) -> None:
+        registry.increment('search_cache_requests_total', (('result', result),))
+
+    async def get(self, version: int, key: Hashable, load: Callable[[], Awaitable[Any]]) -> Any:
+        """Cached value for key at this catalog version, loading it at most once"""
+        slot = (version, key)
+        entry = self.entries.get(slot)
+        if entry is not None:
+            expires, value = entry
+            if expires > time.monotonic():
+                self.entries.move_to_end(slot)
+                self._count('hit')
+                return value
+            del self.entries[slot]
+
+        task = self.in_flight.get(slot)
+        if task is not None:
+            self._count('coalesced')
+        else:
+            self._count('miss')
+            task = self.in_flight[slot] = asyncio.ensure_future(load())
+            task.add_done_callback(lambda done: self._loaded(slot, done))
+        # A caller that goes away must not cancel the read others wait on
+        return await asyncio.shield(task)
+
+    def _loaded(self, slot: Tuple[int, Hashable], task: asyncio.Future) -> None:
+        if self.in_flight.get(slot) is not task:
+            # Cleared by a write while loading
+            return
+        del self.in_flight[slot]
+        if task.cancelled() or task.exception() is not None:
+            return
+        self.entries[slot] = (time.monotonic() + self.ttl, task.result())
+        self.entries.move_to_end(slot)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Forget every result; reads already in flight are not cached"""
+        self.entries.clear()
+        self.in_flight.clear()
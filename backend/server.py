@@ -1,34 +1,114 @@
-from fastapi import FastAPI, APIRouter, HTTPException
+from fastapi import FastAPI, APIRouter, HTTPException, Query, Request, Response, WebSocket
+from fastapi.responses import StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
+from brotli_asgi import BrotliMiddleware
 import os
+import asyncio
 import logging
-import re
+import orjson
+from contextlib import asynccontextmanager
 from pathlib import Path
 from pydantic import BaseModel, Field
-from typing import List, Optional
-from bson import ObjectId
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from typing import Dict, List, Optional
+from bson import ObjectId, json_util
+from bson.errors import InvalidId
 from datetime import datetime
 
+from catalog import (
+    CatalogCache,
+    bump_catalog_version,
+    catalog_version,
+    etag_matches,
+    make_etag,
+)
+from changes import (
+    ChangeFollower,
+    decode_token,
+    encode_token,
+    expired,
+    fetch_changes,
+    record_tombstone,
+)
+from column_store import ColumnStore
+from database import create_client, ensure_indexes, pool_options, read_database, warm_up
+from export import CSV_MEDIA_TYPE, XLSX_MEDIA_TYPE, csv_chunks, xlsx_chunks
+from fuzzy_index import TrigramIndex
+from live_changes import ChangeBroadcaster
+from metrics import MetricsMiddleware, MongoCommandListener, registry
+from price_revision import create_job, finish_job, price_update, revise_prices, revision_filter
+from profiler import SlowQueryProfiler
+from search_cache import SearchCache
+from stock_ledger import adjust_update, move_forever, pending_movements, set_update
+from suggest_index import SuggestIndex
+from summary import (
+    LOW_STOCK_LEVEL,
+    read_summary,
+    reconcile_forever,
+    reconcile_summary,
+    record_change,
+    record_changes,
+)
+from tyre_keys import (
+    backfill_search_keys,
+    brand_key,
+    pattern_key,
+    prefix_match,
+    range_filter,
+    search_keys,
+    size_key,
+)
+from write_batcher import WriteBatcher
+
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
-
-# Create the main app without a prefix
-app = FastAPI()
+# Reads slower than SLOW_QUERY_MS are explained once per shape (0 disables)
+SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', '100'))
+slow_query_profiler = SlowQueryProfiler(mongo_url, SLOW_QUERY_MS) if SLOW_QUERY_MS > 0 else None
 
+listeners = [MongoCommandListener()] + ([slow_query_profiler] if slow_query_profiler else [])
+# Pool size and timeouts come from the environment, see database.py
+client = create_client(mongo_url, listeners)
+db = client[os.environ['DB_NAME']]
+# Read-only routes read through read_db, which may use secondaries
+read_db = read_database(client, os.environ['DB_NAME'])
 
+# Write responses carry the new catalog version in this header; a client
+# that sends it back on reads is guaranteed to see its own write
+CATALOG_VERSION_HEADER = 'X-Catalog-Version'
 
+# Longest /readyz waits for MongoDB to answer
+READY_PING_TIMEOUT = float(os.environ.get('READY_PING_TIMEOUT', '2'))
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
 
+# Page size limits for GET /api/tyres
+DEFAULT_PAGE_SIZE = 200
+MAX_PAGE_SIZE = 1000
+
+# Most rows returned by a non-streamed search
+MAX_SEARCH_RESULTS = 1000
+
+# Largest batch accepted by POST /api/tyres/bulk
+MAX_BULK_ITEMS = 5000
+
+# Streaming (NDJSON) responses for full-inventory reads
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+STREAM_BATCH_SIZE = 500
+
+# Compact list format: the field names once, then one array per tyre
+COLUMNAR_MEDIA_TYPE = "application/vnd.tyres.columnar+json"
+
+# Responses smaller than this are not worth compressing
+COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', '1024'))
+
 
 # Define Models
 class Tyre(BaseModel):
@@ -54,81 +134,632 @@ class TyreUpdate(BaseModel):
     stock: Optional[int] = None
     price: Optional[float] = None
 
+class StockAdjustment(BaseModel):
+    delta: int  # positive for receipts, negative for sales
+
+class StockSummary(BaseModel):
+    skus: int = 0
+    units: int = 0
+    value: float = 0  # price x stock
+    low_stock: int = 0  # tyres with low_stock_level units or fewer
+
+class BrandStockSummary(StockSummary):
+    brand: str
+
+class InventorySummary(BaseModel):
+    overall: StockSummary
+    brands: List[BrandStockSummary]
+    low_stock_level: int
+
+class PriceRevision(BaseModel):
+    brand: Optional[str] = None
+    type: Optional[str] = None
+    size: Optional[str] = None  # size prefix, as for search
+    percent: float = Field(..., gt=-100)  # 5 raises prices by 5%, -10 cuts them by 10%
+    round_to: float = Field(1, ge=0)  # nearest multiple of this; 0 to leave unrounded
+    floor: Optional[float] = Field(None, ge=0)  # lowest price after the change
+
+class PriceRevisionJob(PriceRevision):
+    id: str
+    status: str  # "running", "done" or "failed"
+    total: int
+    matched: int
+    modified: int
+    started_at: datetime
+    finished_at: Optional[datetime] = None
+    error: Optional[str] = None
+
+class StockMovement(BaseModel):
+    delta: int
+    reason: str  # "receipt", "sale" or "count"
+    stock: Optional[int] = None  # stock after the movement
+    at: datetime
+
+class TyreBulkItem(TyreUpdate):
+    id: str
+
+class TyreBulkResult(BaseModel):
+    id: str
+    status: str  # "updated", "not_found" or "invalid"
+    detail: Optional[str] = None
+
+class TyreBulkResponse(BaseModel):
+    matched: int
+    modified: int
+    results: List[TyreBulkResult]
+
+class TyreChanges(BaseModel):
+    changes: List[Tyre]
+    deleted: List[str]
+    next_token: str
+    has_more: bool
+
+TYRE_FIELDS = list(Tyre.model_fields)
+
+def tyre_projection(fields: List[str]) -> dict:
+    """Projection of public Tyre fields with _id converted to an id string
+    by the server, so list routes can encode documents as they come without
+    building models. Needs MongoDB 4.4+ (expressions in find projections).
+    """
+    return {
+        '_id': 0,
+        'id': {'$toString': '$_id'},
+        **{field: 1 for field in fields if field != 'id'},
+    }
+
+class FuzzyMatch(BaseModel):
+    score: float
+    tyre: Tyre
+
+class Suggestion(BaseModel):
+    kind: str  # "brand", "size" or "pattern"
+    value: str
+    count: int  # tyres with this value
+
+# Serialised list and brands bodies for the current catalog version
+catalog_cache = CatalogCache()
+
+# Search results, shared by identical concurrent searches and kept for
+# SEARCH_CACHE_TTL seconds
+search_cache = SearchCache(
+    max_entries=int(os.environ.get('SEARCH_CACHE_SIZE', '256')),
+    ttl=float(os.environ.get('SEARCH_CACHE_TTL', '30')),
+)
+
+# In-process indexes, kept current by local writes and the changes feed.
+# READ_ENGINE=columnar also answers searches from an in-memory column store.
+fuzzy_index = TrigramIndex()
+suggest_index = SuggestIndex()
+column_store = ColumnStore() if os.environ.get('READ_ENGINE') == 'columnar' else None
+index_sync = ChangeFollower([fuzzy_index, suggest_index] + ([column_store] if column_store is not None else []))
+INDEX_SYNC_INTERVAL = float(os.environ.get('INDEX_SYNC_INTERVAL', '5'))
+
+# Changes pushed to /api/tyres/live clients: LIVE_REPLAY_SIZE recent events
+# are kept for clients that reconnect, and a client more than
+# LIVE_QUEUE_SIZE events behind is disconnected
+live_changes = ChangeBroadcaster(
+    TYRE_FIELDS,
+    replay_size=int(os.environ.get('LIVE_REPLAY_SIZE', '10000')),
+    queue_size=int(os.environ.get('LIVE_QUEUE_SIZE', '1000')),
+)
+
+# How often stock movements are moved from the tyres to the stock ledger
+STOCK_MOVE_INTERVAL = float(os.environ.get('STOCK_MOVE_INTERVAL', '2'))
+
+# Opt-in group commit for PUT /api/tyres/{tyre_id}: updates arriving within
+# WRITE_BATCH_WINDOW_MS of each other (0 disables) are written together,
+# at most WRITE_BATCH_SIZE requests per batch
+WRITE_BATCH_WINDOW_MS = float(os.environ.get('WRITE_BATCH_WINDOW_MS', '0'))
+WRITE_BATCH_SIZE = int(os.environ.get('WRITE_BATCH_SIZE', '100'))
+
+# Price revisions matching up to this many tyres run in the request; larger
+# ones run in the background, PRICE_REVISION_CHUNK tyres per update_many
+PRICE_REVISION_SYNC_LIMIT = int(os.environ.get('PRICE_REVISION_SYNC_LIMIT', '5000'))
+PRICE_REVISION_CHUNK = int(os.environ.get('PRICE_REVISION_CHUNK', '5000'))
+
+# How often the brand summaries are rebuilt from a full aggregation
+SUMMARY_RECONCILE_INTERVAL = float(os.environ.get('SUMMARY_RECONCILE_INTERVAL', str(24 * 60 * 60)))
+
+
+async def tyre_written(tyre: dict) -> int:
+    """Publish a created or updated tyre document to caches and indexes.
+    Returns the new catalog version, as do the two functions below.
+    """
+    index_sync.upsert(tyre)
+    search_cache.clear()
+    return await bump_catalog_version(db)
+
+async def tyres_written(tyres: Optional[List[dict]] = None) -> int:
+    """Publish a multi-document write; without the written documents the
+    indexes catch up from the feed"""
+    if tyres is None:
+        await index_sync.sync(db)
+    else:
+        for tyre in tyres:
+            index_sync.upsert(tyre)
+    search_cache.clear()
+    return await bump_catalog_version(db)
+
+async def tyre_deleted(tyre_id: str) -> int:
+    index_sync.remove(tyre_id)
+    search_cache.clear()
+    return await bump_catalog_version(db)
+
+def written(response: Response, version: int):
+    """Tell the client which catalog version includes its write"""
+    response.headers[CATALOG_VERSION_HEADER] = str(version)
+
+def read_after(request: Request) -> int:
+    """Catalog version the client has already written, if it sent one"""
+    try:
+        return int(request.headers.get(CATALOG_VERSION_HEADER, 0))
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid {CATALOG_VERSION_HEADER} header")
+
+async def start_read(request: Request):
+    """Session, database handle and catalog version for a read-only route.
+
+    Reads go to read_db in a causally consistent session, so anything read
+    after the version is at least as new as it, whichever replica set
+    member answers; bodies cached under that version are never stale.
+    When that member has not yet seen the client's own write (see
+    read_after) the read is pinned to the primary instead. The caller
+    ends the session.
+    """
+    session = await client.start_session(causal_consistency=True)
+    try:
+        handle = read_db
+        version = await catalog_version(handle, session)
+        if version < read_after(request):
+            handle = db
+            version = await catalog_version(handle, session)
+    except BaseException:
+        await session.end_session()
+        raise
+    return session, handle, version
+
 
 # Routes
 @api_router.get("/")
 async def root():
     return {"message": "Tyre Inventory API"}
 
+def parse_cursor(cursor: str) -> ObjectId:
+    """Decode a next-page cursor into the last _id seen"""
+    try:
+        return ObjectId(cursor)
+    except (InvalidId, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def wants_stream(request: Request, stream: bool) -> bool:
+    """Whether the client asked for an NDJSON stream"""
+    return stream or NDJSON_MEDIA_TYPE in request.headers.get('accept', '')
+
+def parse_fields(fields: Optional[str]) -> List[str]:
+    """Fields selected with ?fields=brand,size,...; id is always included"""
+    if not fields:
+        return TYRE_FIELDS
+    selected = {field.strip() for field in fields.split(',') if field.strip()}
+    unknown = selected - set(TYRE_FIELDS)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    return [field for field in TYRE_FIELDS if field == 'id' or field in selected]
+
+def wants_columnar(request: Request, format: Optional[str]) -> bool:
+    if format:
+        if format not in ('json', 'columnar'):
+            raise HTTPException(status_code=400, detail="format must be json or columnar")
+        return format == 'columnar'
+    return COLUMNAR_MEDIA_TYPE in request.headers.get('accept', '')
+
+def encode_tyres(tyres: List[dict], fields: List[str], columnar: bool) -> bytes:
+    """Encode projected tyre documents as a JSON list or in columnar form"""
+    if columnar:
+        return orjson.dumps({
+            'fields': fields,
+            'rows': [[tyre.get(field) for field in fields] for tyre in tyres],
+        })
+    if fields is not TYRE_FIELDS:
+        tyres = [{field: tyre.get(field) for field in fields} for tyre in tyres]
+    return orjson.dumps(tyres)
+
+def tyres_response(body: bytes, columnar: bool, headers: Optional[dict] = None) -> Response:
+    media_type = COLUMNAR_MEDIA_TYPE if columnar else 'application/json'
+    return Response(content=body, media_type=media_type, headers={'Vary': 'Accept', **(headers or {})})
+
+def find_tyres(handle, query: dict, fields: List[str] = TYRE_FIELDS, session=None):
+    """Cursor over the given public tyre fields (see tyre_projection)"""
+    return handle.tyres.find(query, tyre_projection(fields), session=session)
+
+async def ndjson_tyres(cursor, session=None):
+    """Yield each tyre as one JSON line as soon as it is read from the cursor"""
+    try:
+        async for tyre in cursor.batch_size(STREAM_BATCH_SIZE):
+            yield orjson.dumps(tyre) + b"\n"
+    finally:
+        if session is not None:
+            await session.end_session()
+
+def stream_tyres(cursor, session=None) -> StreamingResponse:
+    """Stream the cursor as NDJSON; the stream ends the session when done"""
+    return StreamingResponse(ndjson_tyres(cursor, session), media_type=NDJSON_MEDIA_TYPE)
+
+def not_modified(etag: str, headers: Optional[dict] = None) -> Response:
+    return Response(status_code=304, headers={'ETag': etag, **(headers or {})})
+
 @api_router.get("/tyres", response_model=List[Tyre])
-async def get_all_tyres():
-    """Get all tyres from inventory"""
-    tyres = await db.tyres.find().to_list(1000)
-    result = []
-    for tyre in tyres:
-        tyre['id'] = str(tyre['_id'])
-        del tyre['_id']
-        result.append(Tyre(**tyre))
-    return result
+async def get_all_tyres(
+    request: Request,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    stream: bool = False,
+    format: Optional[str] = None,
+    fields: Optional[str] = None,
+):
+    """Get a page of tyres from inventory, ordered by id.
+
+    When more tyres remain, the cursor for the next page is returned in the
+    X-Next-Cursor header. With ?stream=1 or Accept: application/x-ndjson the
+    whole inventory (from the cursor on) is streamed as NDJSON instead.
+    ?format=columnar (or the columnar Accept type) sends the field names once
+    followed by row arrays, and ?fields= limits the fields sent.
+    Responses carry the catalog version as an ETag; a matching
+    If-None-Match gets 304 Not Modified.
+    """
+    query = {}
+    if cursor:
+        query['_id'] = {'$gt': parse_cursor(cursor)}
+    selected = parse_fields(fields)
+    columnar = wants_columnar(request, format)
+    streamed = wants_stream(request, stream)
+
+    session, handle, version = await start_read(request)
+    try:
+        # Each representation of the same URL gets its own ETag
+        etag = make_etag(version, 'ndjson' if streamed else 'columnar' if columnar else '')
+        if etag_matches(request, etag):
+            return not_modified(etag, {'Vary': 'Accept'})
+
+        if streamed:
+            response = stream_tyres(find_tyres(handle, query, selected, session).sort('_id', 1), session)
+            session = None
+            response.headers['ETag'] = etag
+            response.headers['Vary'] = 'Accept'
+            return response
+
+        cache_key = ('tyres', limit, cursor, tuple(selected), columnar)
+        page = catalog_cache.get(version, cache_key)
+        if page is None:
+            # Keyset pagination on the _id index: fetch one extra row to detect a next page
+            tyres = await (
+                find_tyres(handle, query, selected, session).sort('_id', 1).limit(limit + 1).to_list(limit + 1)
+            )
+            next_cursor = None
+            if len(tyres) > limit:
+                tyres = tyres[:limit]
+                next_cursor = tyres[-1]['id']
+            page = (encode_tyres(tyres, selected, columnar), next_cursor)
+            catalog_cache.put(version, cache_key, page)
+    finally:
+        if session is not None:
+            await session.end_session()
+
+    body, next_cursor = page
+    headers = {'ETag': etag}
+    if next_cursor:
+        headers['X-Next-Cursor'] = next_cursor
+    return tyres_response(body, columnar, headers)
 
 @api_router.get("/tyres/search")
-async def search_tyres(brand: Optional[str] = None, size: Optional[str] = None):
-    """Search tyres by brand or size"""
+async def search_tyres(
+    request: Request,
+    brand: Optional[str] = None,
+    size: Optional[str] = None,
+    pattern: Optional[str] = None,
+    rim: Optional[float] = None,
+    min_rim: Optional[float] = None,
+    max_rim: Optional[float] = None,
+    min_width: Optional[float] = None,
+    max_width: Optional[float] = None,
+    aspect: Optional[int] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    max_stock: Optional[int] = None,
+    limit: int = Query(MAX_SEARCH_RESULTS, ge=1, le=MAX_SEARCH_RESULTS),
+    cursor: Optional[str] = None,
+    stream: bool = False,
+    format: Optional[str] = None,
+    fields: Optional[str] = None,
+):
+    """Search tyres by brand, size or pattern prefix, or by numeric ranges.
+
+    Matching is done on the normalised brand_key/size_key/pattern_key
+    fields so the lookups are index range scans: "mr" finds MRF and
+    "90/100" (or "90100") finds 90/100*10. rim, width and aspect filter on
+    the parsed size fields, e.g. ?rim=17 or ?min_width=90&max_width=100;
+    max_stock=5 lists low-stock tyres. Results are paged by id like
+    GET /api/tyres: limit and cursor select the page and X-Next-Cursor
+    holds the cursor for the next one. format and fields work as for
+    GET /api/tyres.
+    Identical searches running at the same time share one database read,
+    and results are reused until the next write or SEARCH_CACHE_TTL.
+    """
+    selected = parse_fields(fields)
+    columnar = wants_columnar(request, format)
+    after_id = parse_cursor(cursor) if cursor else None
+
+    if column_store is not None and not wants_stream(request, stream):
+        if rim is not None:
+            min_rim = max_rim = rim
+        slots = column_store.query(
+            brand=brand, size=size, pattern=pattern, min_rim=min_rim, max_rim=max_rim,
+            min_width=min_width, max_width=max_width, aspect=aspect,
+            min_price=min_price, max_price=max_price, max_stock=max_stock,
+        )
+        slots = column_store.page(slots, str(after_id) if after_id else None, limit + 1)
+        tyres = column_store.rows(slots[:limit])
+        headers = {'X-Next-Cursor': tyres[-1]['id']} if len(slots) > limit else None
+        return tyres_response(encode_tyres(tyres, selected, columnar), columnar, headers)
+
     query = {}
     if brand:
-        # Escape regex metacharacters for brand search
-        escaped_brand = re.escape(brand)
-        query['brand'] = {'$regex': escaped_brand, '$options': 'i'}
+        query['brand_key'] = prefix_match(brand_key(brand))
     if size:
-        # Escape regex metacharacters for size search
-        escaped_size = re.escape(size)
-        query['size'] = {'$regex': escaped_size, '$options': 'i'}
-    
-    tyres = await db.tyres.find(query).to_list(1000)
-    result = []
+        query['size_key'] = prefix_match(size_key(size))
+    if pattern:
+        query['pattern_key'] = prefix_match(pattern_key(pattern))
+    if rim is not None:
+        query['rim'] = rim
+    elif range_filter(min_rim, max_rim):
+        query['rim'] = range_filter(min_rim, max_rim)
+    if range_filter(min_width, max_width):
+        query['width'] = range_filter(min_width, max_width)
+    if aspect is not None:
+        query['aspect'] = aspect
+    if range_filter(min_price, max_price):
+        query['price'] = range_filter(min_price, max_price)
+    if max_stock is not None:
+        query['stock'] = {'$lte': max_stock}
+    # The query is built from normalised keys, so "MRF" and "mrf" share an entry
+    cache_key = (orjson.dumps(query, option=orjson.OPT_SORT_KEYS), limit, cursor, tuple(selected), columnar)
+    if after_id is not None:
+        query['_id'] = {'$gt': after_id}
+
+    session, handle, version = await start_read(request)
+    if wants_stream(request, stream):
+        return stream_tyres(find_tyres(handle, query, selected, session).sort('_id', 1), session)
+    cluster_time, operation_time = session.cluster_time, session.operation_time
+    await session.end_session()
+
+    async def load():
+        # The load is shared by every request for the same search and can
+        # outlive this one, so it reads in its own session, caught up with
+        # the catalog version read above
+        load_session = await client.start_session(causal_consistency=True)
+        try:
+            if cluster_time is not None:
+                load_session.advance_cluster_time(cluster_time)
+            if operation_time is not None:
+                load_session.advance_operation_time(operation_time)
+            # Keyset pagination on _id: fetch one extra row to detect a next page
+            tyres = await (
+                find_tyres(handle, query, selected, load_session).sort('_id', 1).limit(limit + 1).to_list(limit + 1)
+            )
+        finally:
+            await load_session.end_session()
+        next_cursor = None
+        if len(tyres) > limit:
+            tyres = tyres[:limit]
+            next_cursor = tyres[-1]['id']
+        return encode_tyres(tyres, selected, columnar), next_cursor
+
+    body, next_cursor = await search_cache.get(version, cache_key, load)
+    return tyres_response(body, columnar, {'X-Next-Cursor': next_cursor} if next_cursor else None)
+
+async def ending_session(chunks, session):
+    """Pass chunks through, then end the session the cursor belongs to"""
+    try:
+        async for chunk in chunks:
+            yield chunk
+    finally:
+        await session.end_session()
+
+EXPORT_FORMATS = {
+    'csv': (csv_chunks, CSV_MEDIA_TYPE),
+    'xlsx': (xlsx_chunks, XLSX_MEDIA_TYPE),
+}
+
+@api_router.get("/tyres/export")
+async def export_tyres(
+    request: Request,
+    format: str = 'csv',
+    brand: Optional[str] = None,
+    size: Optional[str] = None,
+):
+    """Download the inventory, or the tyres matching brand/size prefixes,
+    as a CSV or XLSX file.
+
+    Rows are read from the cursor batch by batch, so memory use does not
+    depend on the catalogue size; CSV rows are sent as they are read.
+    """
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail="format must be csv or xlsx")
+    encode, media_type = EXPORT_FORMATS[format]
+
+    query = {}
+    if brand:
+        query['brand_key'] = prefix_match(brand_key(brand))
+    if size:
+        query['size_key'] = prefix_match(size_key(size))
+
+    session, handle, _ = await start_read(request)
+    cursor = find_tyres(handle, query, TYRE_FIELDS, session).sort('_id', 1).batch_size(STREAM_BATCH_SIZE)
+    filename = f"tyres-{datetime.utcnow():%Y%m%d-%H%M%S}.{format}"
+    return StreamingResponse(
+        ending_session(encode(cursor, TYRE_FIELDS), session),
+        media_type=media_type,
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'},
+    )
+
+@api_router.get("/tyres/fuzzy", response_model=List[FuzzyMatch])
+async def fuzzy_search_tyres(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(20, ge=1, le=100),
+    min_score: float = Query(0.4, ge=0, le=1),
+):
+    """Typo-tolerant search over brand and pattern, best matches first"""
+    ranked = fuzzy_index.search(q, limit, min_score)
+    if not ranked:
+        return []
+
+    tyres = await db.tyres.find({'_id': {'$in': [ObjectId(tyre_id) for tyre_id, _ in ranked]}}).to_list(None)
+    by_id = {}
     for tyre in tyres:
         tyre['id'] = str(tyre['_id'])
         del tyre['_id']
-        result.append(Tyre(**tyre))
-    return result
+        by_id[tyre['id']] = Tyre(**tyre)
+    return [
+        FuzzyMatch(score=score, tyre=by_id[tyre_id])
+        for tyre_id, score in ranked if tyre_id in by_id
+    ]
+
+@api_router.get("/tyres/suggest", response_model=List[Suggestion])
+async def suggest_tyres(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(10, ge=1, le=50),
+):
+    """Brands, sizes and patterns starting with q, most common first.
+
+    Answered from an in-memory prefix index, so it is cheap enough to call
+    on every keystroke. Sizes match without separators: "90100" and
+    "90/100" both complete to 90/100*10.
+    """
+    return [
+        Suggestion(kind=kind, value=value, count=count)
+        for kind, value, count in suggest_index.suggest(q, limit)
+    ]
+
+@api_router.get("/tyres/changes", response_model=TyreChanges)
+async def get_tyre_changes(
+    since: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+):
+    """Get tyres created, updated or deleted after a sync token.
+
+    Without a token the feed starts from the beginning. Keep calling with
+    next_token while has_more is true, then poll with the last token.
+    Tokens older than the tombstone retention get 410 Gone: deletes since
+    then may no longer be known, so the client must sync from scratch.
+    """
+    try:
+        position = decode_token(since) if since else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid sync token")
+    if position is not None and expired(position):
+        raise HTTPException(status_code=410, detail="Sync token expired; sync again without a token")
+
+    tyres, deleted, next_pos, has_more = await fetch_changes(db, position, limit)
+
+    changes = []
+    for tyre in tyres:
+        tyre['id'] = str(tyre['_id'])
+        del tyre['_id']
+        changes.append(Tyre(**tyre))
+    return TyreChanges(
+        changes=changes,
+        deleted=[str(tyre_id) for tyre_id in deleted],
+        next_token=encode_token(next_pos),
+        has_more=has_more,
+    )
+
+async def send_live_changes(websocket: WebSocket, subscriber) -> None:
+    async for message in subscriber.messages():
+        await websocket.send_text(message)
+    # Dropped for falling behind; the client reconnects and catches up
+    await websocket.close(code=1013)
+
+async def until_disconnected(websocket: WebSocket) -> None:
+    while (await websocket.receive())['type'] != 'websocket.disconnect':
+        pass
+
+@api_router.websocket("/tyres/live")
+async def live_tyres(websocket: WebSocket, after: Optional[str] = None):
+    """Push tyre changes as they happen, as JSON text messages.
+
+    {"type": "upsert", "token", "tyre"} and {"type": "delete", "token", "id"}
+    carry changes; {"type": "ready", "token"} follows any catching up. To
+    reconnect without missing anything, pass the last token seen as
+    `after`. {"type": "reset"} means the changes since then are no longer
+    available and the list should be reloaded.
+    """
+    await websocket.accept()
+    subscriber = live_changes.subscribe(after)
+    tasks = [
+        asyncio.create_task(send_live_changes(websocket, subscriber)),
+        asyncio.create_task(until_disconnected(websocket)),
+    ]
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        live_changes.unsubscribe(subscriber)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
 
 @api_router.post("/tyres", response_model=Tyre)
-async def create_tyre(tyre: TyreCreate):
-    """Add a new tyre to inventory"""
+async def create_tyre(tyre: TyreCreate, response: Response):
+    """Add a new tyre to inventory; 409 if one with the same brand, size,
+    type and pattern exists"""
     tyre_dict = tyre.dict()
+    tyre_dict.update(search_keys(tyre_dict))
     tyre_dict['created_at'] = datetime.utcnow()
     tyre_dict['updated_at'] = datetime.utcnow()
     
-    result = await db.tyres.insert_one(tyre_dict)
+    try:
+        result = await db.tyres.insert_one(tyre_dict)
+    except DuplicateKeyError:
+        raise HTTPException(status_code=409, detail="Tyre already exists")
+    await record_change(db, None, tyre_dict)
+    written(response, await tyre_written(tyre_dict))
     tyre_dict['id'] = str(result.inserted_id)
     return Tyre(**tyre_dict)
 
 @api_router.put("/tyres/{tyre_id}", response_model=Tyre)
-async def update_tyre(tyre_id: str, update: TyreUpdate):
-    """Update stock or price of a tyre"""
-    try:
-        # Build update dict
-        update_dict = {}
-        if update.stock is not None:
-            update_dict['stock'] = update.stock
-        if update.price is not None:
-            update_dict['price'] = update.price
-        
-        if not update_dict:
+async def update_tyre(tyre_id: str, update: TyreUpdate, response: Response):
+    """Update stock or price of a tyre.
+
+    A new stock figure is also recorded in the stock ledger as a count,
+    in the same write.
+    With WRITE_BATCH_WINDOW_MS set, updates arriving together are merged
+    and written as one batch.
+    """
+    try:
+        if update.stock is None and update.price is None:
             raise HTTPException(status_code=400, detail="No fields to update")
-        
-        update_dict['updated_at'] = datetime.utcnow()
-        
-        # Update in database
-        result = await db.tyres.find_one_and_update(
+
+        if write_batcher is not None:
+            tyre, version = await write_batcher.submit(
+                ObjectId(tyre_id), update.dict(include={'stock', 'price'}, exclude_none=True)
+            )
+            if version is not None:
+                written(response, version)
+            # Requests merged into one update share the document
+            return Tyre(**{**tyre, 'id': str(tyre['_id'])})
+
+        # Update in database; the old values are needed for the summary
+        changes = update.dict(include={'stock', 'price'}, exclude_none=True)
+        now = datetime.utcnow()
+        before = await db.tyres.find_one_and_update(
             {'_id': ObjectId(tyre_id)},
-            {'$set': update_dict},
-            return_document=True
+            set_update(changes, now),
+            return_document=ReturnDocument.BEFORE
         )
-        
-        if not result:
+        if not before:
             raise HTTPException(status_code=404, detail="Tyre not found")
-        
+        result = {**before, **changes, 'updated_at': now}
+        await record_change(db, before, result)
+        written(response, await tyre_written(result))
+
         result['id'] = str(result['_id'])
         del result['_id']
         return Tyre(**result)
@@ -138,26 +769,347 @@ async def update_tyre(tyre_id: str, update: TyreUpdate):
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+@api_router.post("/tyres/{tyre_id}/stock", response_model=Tyre)
+async def adjust_stock(tyre_id: str, adjustment: StockAdjustment, response: Response):
+    """Atomically add to or take from a tyre's stock.
+
+    The guard on the current stock and the $inc run as one
+    find_one_and_update, so concurrent sales can never take stock below
+    zero; a sale that would returns 409 instead. The same write records
+    the receipt or sale for the stock ledger.
+    """
+    if adjustment.delta == 0:
+        raise HTTPException(status_code=400, detail="delta must not be zero")
+    try:
+        oid = ObjectId(tyre_id)
+    except (InvalidId, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid tyre id")
+
+    result = await db.tyres.find_one_and_update(
+        {'_id': oid, 'stock': {'$gte': -adjustment.delta}},
+        adjust_update(adjustment.delta, datetime.utcnow()),
+        return_document=ReturnDocument.AFTER
+    )
+    if not result:
+        if await db.tyres.count_documents({'_id': oid}, limit=1) == 0:
+            raise HTTPException(status_code=404, detail="Tyre not found")
+        raise HTTPException(status_code=409, detail="Insufficient stock")
+    await record_change(db, {**result, 'stock': result['stock'] - adjustment.delta}, result)
+    written(response, await tyre_written(result))
+
+    result['id'] = str(result['_id'])
+    del result['_id']
+    return Tyre(**result)
+
+@api_router.get("/tyres/{tyre_id}/movements", response_model=List[StockMovement])
+async def get_stock_movements(
+    tyre_id: str,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+):
+    """Stock history of a tyre from the stock ledger, newest first,
+    including movements not yet moved off the tyre"""
+    try:
+        oid = ObjectId(tyre_id)
+    except (InvalidId, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid tyre id")
+    pending = await pending_movements(db, oid)
+    moved = await db.stock_movements.find(
+        {'tyre_id': oid}, {'delta': 1, 'reason': 1, 'stock': 1, 'at': 1}
+    ).sort('at', -1).limit(limit).to_list(limit)
+    # An entry can be in both while it is being moved
+    movements = {movement['_id']: movement for movement in moved + pending}
+    return sorted(movements.values(), key=lambda movement: movement['at'], reverse=True)[:limit]
+
+async def apply_tyre_updates(updates: Dict[ObjectId, dict]):
+    """Set stock and/or price on many tyres in a fixed number of round trips.
+
+    Fields are written with one unordered bulk_write, whose pipeline
+    updates also record stock counts for the stock ledger. Returns the updated tyre documents by _id
+    (missing tyres are left out), the number of tyres modified, write
+    errors by _id and the new catalog version, or None when nothing was
+    written.
+    """
+    tyres = await db.tyres.find({'_id': {'$in': list(updates)}}).to_list(None)
+    found = {tyre['_id']: tyre for tyre in tyres}
+    if not found:
+        return {}, 0, {}, None
+
+    now = datetime.utcnow()
+    oids = list(found)
+    operations = [UpdateOne({'_id': oid}, set_update(updates[oid], now)) for oid in oids]
+    errors = {}
+    try:
+        result = await db.tyres.bulk_write(operations, ordered=False)
+        modified = result.modified_count
+    except BulkWriteError as e:
+        modified = e.details['nModified']
+        for error in e.details['writeErrors']:
+            errors[oids[error['index']]] = error['errmsg']
+
+    updated = {
+        oid: {**found[oid], **updates[oid], 'updated_at': now}
+        for oid in oids if oid not in errors
+    }
+    changes = [(found[oid], tyre) for oid, tyre in updated.items()]
+    await record_changes(db, changes)
+    version = await tyres_written(list(updated.values()))
+    return updated, modified, errors, version
+
+async def flush_tyre_updates(updates: Dict[ObjectId, dict]) -> dict:
+    """Write one batch from the write batcher; each tyre gets its updated
+    document and the catalog version, or the error for its requests"""
+    tyres, _, errors, version = await apply_tyre_updates(updates)
+    results = {}
+    for oid in updates:
+        if oid in errors:
+            results[oid] = HTTPException(status_code=400, detail=errors[oid])
+        elif oid not in tyres:
+            results[oid] = HTTPException(status_code=404, detail="Tyre not found")
+        else:
+            results[oid] = (tyres[oid], version)
+    return results
+
+write_batcher = (
+    WriteBatcher(flush_tyre_updates, WRITE_BATCH_WINDOW_MS / 1000, WRITE_BATCH_SIZE)
+    if WRITE_BATCH_WINDOW_MS > 0 else None
+)
+
+@api_router.post("/tyres/bulk", response_model=TyreBulkResponse)
+async def bulk_update_tyres(items: List[TyreBulkItem], response: Response):
+    """Update stock and/or price of many tyres in one unordered bulk_write.
+
+    Every item gets its own result; invalid items are reported without
+    blocking the rest. Repeated ids are merged, later fields winning.
+    Stock counts are recorded for the stock ledger by the same bulk_write.
+    """
+    if len(items) > MAX_BULK_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BULK_ITEMS} items per request")
+
+    # Validate everything in one pass before touching the database
+    results = [TyreBulkResult(id=item.id, status="updated") for item in items]
+
+    def fail(index: int, status: str, detail: str):
+        results[index].status = status
+        results[index].detail = detail
+
+    updates = {}  # ObjectId -> (fields to $set, indexes of the items merged into it)
+    for index, item in enumerate(items):
+        fields = item.dict(include={'stock', 'price'}, exclude_none=True)
+        if not fields:
+            fail(index, "invalid", "No fields to update")
+            continue
+        try:
+            oid = ObjectId(item.id)
+        except (InvalidId, TypeError):
+            fail(index, "invalid", "Invalid tyre id")
+            continue
+        merged, indexes = updates.setdefault(oid, ({}, []))
+        merged.update(fields)
+        indexes.append(index)
+
+    matched = modified = 0
+    if updates:
+        tyres, modified, errors, version = await apply_tyre_updates(
+            {oid: fields for oid, (fields, _) in updates.items()}
+        )
+        matched = len(tyres) + len(errors)
+        for oid, (_, indexes) in updates.items():
+            for index in indexes:
+                if oid in errors:
+                    fail(index, "invalid", errors[oid])
+                elif oid not in tyres:
+                    fail(index, "not_found", "Tyre not found")
+        if version is not None:
+            written(response, version)
+
+    return TyreBulkResponse(matched=matched, modified=modified, results=results)
+
 @api_router.delete("/tyres/{tyre_id}")
-async def delete_tyre(tyre_id: str):
+async def delete_tyre(tyre_id: str, response: Response):
     """Delete a tyre from inventory"""
     try:
-        result = await db.tyres.delete_one({'_id': ObjectId(tyre_id)})
-        if result.deleted_count == 0:
+        result = await db.tyres.find_one_and_delete(
+            {'_id': ObjectId(tyre_id)}, {'brand': 1, 'price': 1, 'stock': 1}
+        )
+        if result is None:
             raise HTTPException(status_code=404, detail="Tyre not found")
+        await record_change(db, result, None)
+        await record_tombstone(db, ObjectId(tyre_id))
+        written(response, await tyre_deleted(tyre_id))
         return {"message": "Tyre deleted successfully"}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+# Background price revisions, kept referenced until they finish
+price_revision_tasks = set()
+
+async def run_price_revision(job_id: ObjectId, query: dict, update: list, chunk_size: Optional[int] = None) -> int:
+    """Apply a price revision and publish it; returns the new catalog version"""
+    error = None
+    try:
+        await revise_prices(db, job_id, query, update, chunk_size)
+    except asyncio.CancelledError:
+        await finish_job(db, job_id, "Interrupted by shutdown")
+        raise
+    except Exception as e:
+        logger.exception("Price revision %s failed", job_id)
+        error = str(e)
+    # Even a failed revision may have changed some prices
+    await reconcile_summary(db)
+    version = await tyres_written()
+    await finish_job(db, job_id, error)
+    return version
+
+@api_router.post("/tyres/price-revisions", response_model=PriceRevisionJob)
+async def revise_tyre_prices(revision: PriceRevision, response: Response):
+    """Change the price of every tyre matching a brand, type and size prefix.
+
+    The new price is computed inside MongoDB by an update_many with a
+    pipeline update: price x (1 + percent/100), rounded to the nearest
+    multiple of round_to and no lower than floor. Revisions of up to
+    PRICE_REVISION_SYNC_LIMIT tyres finish before the response; larger
+    ones return 202 with a job to poll at GET /api/tyres/price-revisions/{id}.
+    """
+    query = revision_filter(revision.brand, revision.type, revision.size)
+    update = price_update(revision.percent, revision.round_to, revision.floor)
+    total = await db.tyres.count_documents(query)
+    job_id = await create_job(db, revision.dict(), total)
+
+    if total <= PRICE_REVISION_SYNC_LIMIT:
+        written(response, await run_price_revision(job_id, query, update))
+    else:
+        task = asyncio.create_task(run_price_revision(job_id, query, update, PRICE_REVISION_CHUNK))
+        price_revision_tasks.add(task)
+        task.add_done_callback(price_revision_tasks.discard)
+        response.status_code = 202
+
+    job = await get_price_revision(str(job_id))
+    if job.status == 'failed':
+        raise HTTPException(status_code=500, detail=f"Price revision failed: {job.error}")
+    return job
+
+@api_router.get("/tyres/price-revisions/{job_id}", response_model=PriceRevisionJob)
+async def get_price_revision(job_id: str):
+    """Progress of a price revision: tyres matched and modified so far of total"""
+    try:
+        oid = ObjectId(job_id)
+    except (InvalidId, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid job id")
+    job = await db.price_revisions.find_one({'_id': oid})
+    if not job:
+        raise HTTPException(status_code=404, detail="Price revision not found")
+    job['id'] = str(job['_id'])
+    del job['_id']
+    return PriceRevisionJob(**job)
+
+def inventory_summary(brands: List[dict]) -> InventorySummary:
+    overall = StockSummary()
+    for brand in brands:
+        overall.skus += brand['skus']
+        overall.units += brand['units']
+        overall.value += brand['value']
+        overall.low_stock += brand['low_stock']
+    overall.value = round(overall.value, 2)
+    return InventorySummary(
+        overall=overall,
+        brands=[
+            BrandStockSummary(
+                brand=brand['_id'], skus=brand['skus'], units=brand['units'],
+                value=round(brand['value'], 2), low_stock=brand['low_stock'],
+            )
+            for brand in brands
+        ],
+        low_stock_level=LOW_STOCK_LEVEL,
+    )
+
+@api_router.get("/tyres/summary", response_model=InventorySummary)
+async def get_summary():
+    """SKU count, units, stock value and low-stock count per brand and overall.
+
+    Served from per-brand summary documents that writes keep current, so
+    the cost does not grow with the catalogue.
+    """
+    return inventory_summary(await read_summary(read_db))
+
+@api_router.post("/tyres/summary/reconcile", response_model=InventorySummary)
+async def reconcile_tyre_summary():
+    """Rebuild the summary from a full aggregation over the tyres"""
+    return inventory_summary(await reconcile_summary(db))
+
 @api_router.get("/tyres/brands")
-async def get_brands():
+async def get_brands(request: Request):
     """Get list of all brands"""
-    brands = await db.tyres.distinct('brand')
-    return {"brands": sorted(brands)}
+    session, handle, version = await start_read(request)
+    try:
+        etag = make_etag(version)
+        if etag_matches(request, etag):
+            return not_modified(etag)
+
+        body = catalog_cache.get(version, 'brands')
+        if body is None:
+            brands = await handle.tyres.distinct('brand', session=session)
+            body = orjson.dumps({"brands": sorted(brands)})
+            catalog_cache.put(version, 'brands', body)
+    finally:
+        await session.end_session()
+    return Response(content=body, media_type='application/json', headers={'ETag': etag})
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Warm the pool and build indexes before /readyz lets traffic in"""
+    app.state.ready = False
+    await warm_up(client, pool_options()['minPoolSize'])
+    await ensure_indexes(db)
+    backfilled = await backfill_search_keys(db.tyres)
+    if backfilled:
+        logger.info("Migrated search keys on %d existing tyres", backfilled)
+
+    await index_sync.sync(db)
+    logger.info("Loaded %d tyres into the in-memory indexes", len(fuzzy_index))
+    if column_store is not None:
+        logger.info("Serving searches from the columnar read engine")
+    if await db.brand_summaries.count_documents({}, limit=1) == 0:
+        await reconcile_summary(db)
+
+    index_sync_task = asyncio.create_task(index_sync.follow(db, INDEX_SYNC_INTERVAL))
+    reconcile_task = asyncio.create_task(reconcile_forever(db, SUMMARY_RECONCILE_INTERVAL))
+    movements_task = asyncio.create_task(move_forever(db, STOCK_MOVE_INTERVAL))
+    live_task = asyncio.create_task(live_changes.follow(db.tyres))
+    app.state.ready = True
+    try:
+        yield
+    finally:
+        app.state.ready = False
+        index_sync_task.cancel()
+        reconcile_task.cancel()
+        movements_task.cancel()
+        live_task.cancel()
+        live_changes.close()
+        if write_batcher is not None:
+            await write_batcher.close()
+        for task in price_revision_tasks:
+            task.cancel()
+        await asyncio.gather(*price_revision_tasks, return_exceptions=True)
+        if slow_query_profiler:
+            slow_query_profiler.close()
+        client.close()
+
+# Create the main app without a prefix
+app = FastAPI(lifespan=lifespan)
 
 # Include the router in the main app
 app.include_router(api_router)
 
+# Brotli for clients that accept it, gzip otherwise
+app.add_middleware(BrotliMiddleware, minimum_size=COMPRESSION_MIN_SIZE, gzip_fallback=True)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=[
@@ -166,15 +1118,35 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Next-Cursor", CATALOG_VERSION_HEADER, "Content-Disposition"],
 )
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
-logger = logging.getLogger(__name__)
+# Per-route latency and status metrics; outermost so it times everything
+app.add_middleware(MetricsMiddleware)
+
+@app.get("/healthz", include_in_schema=False)
+async def healthz():
+    """Liveness: the process is serving requests"""
+    return {"status": "ok"}
+
+@app.get("/readyz", include_in_schema=False)
+async def readyz():
+    """Readiness: startup has finished and MongoDB answers a ping"""
+    if not app.state.ready:
+        raise HTTPException(status_code=503, detail="Starting up")
+    try:
+        await asyncio.wait_for(client.admin.command('ping'), READY_PING_TIMEOUT)
+    except Exception:
+        raise HTTPException(status_code=503, detail="Database unavailable")
+    return {"status": "ready"}
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus scrape endpoint"""
+    return Response(content=registry.render(), media_type="text/plain; version=0.0.4")
 
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    client.close()
+@app.get("/debug/slow-queries", include_in_schema=False)
+async def slow_queries():
+    """Latest slow-query explain reports, newest first"""
+    reports = list(reversed(slow_query_profiler.reports)) if slow_query_profiler else []
+    return Response(content=json_util.dumps(reports), media_type='application/json')
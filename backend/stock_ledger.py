@@ -0,0 +1,134 @@
+"""History of stock movements.
+
+Every receipt, sale and stock count is kept in `stock_movements` with its
+delta, reason and the stock it left behind. This is a history ledger:
+tyres.stock stays the current figure, updated in place by each write, so
+reads never add up movements. It does not take contention off busy
+tyres; every stock change still writes the tyre document.
+
+So that a stock change and its movement are written together, the
+movement is appended to the tyre's `movements` array by the same
+pipeline update that changes the stock. A background task moves those
+entries into `stock_movements`; each keeps the _id it was created with,
+so a pass interrupted between the insert and the $pull (or two workers
+moving the same entries) never records a movement twice.
+"""
+import asyncio
+import logging
+from datetime import datetime
+from typing import Iterable, List, Tuple
+
+from bson import ObjectId
+from pymongo import ASCENDING, IndexModel, UpdateOne
+from pymongo.errors import BulkWriteError
+
+MOVEMENT_INDEXES = [
+    [('tyre_id', ASCENDING), ('at', ASCENDING)],
+    [('at', ASCENDING)],
+]
+
+# Tyres with movements still to be moved to the ledger
+PENDING_MOVEMENTS_INDEX = IndexModel(
+    [('movements._id', ASCENDING)],
+    partialFilterExpression={'movements._id': {'$exists': True}},
+)
+
+# Reasons recorded on movements
+RECEIPT, SALE, COUNT = 'receipt', 'sale', 'count'
+
+DUPLICATE_KEY = 11000
+
+logger = logging.getLogger(__name__)
+
+
+def movement(delta, reason: str, stock, now: datetime) -> dict:
+    """A ledger entry; delta and stock may be expressions over the tyre"""
+    return {'_id': ObjectId(), 'delta': delta, 'reason': reason, 'stock': stock, 'at': now}
+
+
+def appended(entry: dict) -> dict:
+    """The tyre's pending movements with one more"""
+    return {'$concatArrays': [{'$ifNull': ['$movements', []]}, [entry]]}
+
+
+def adjust_update(delta: int, now: datetime) -> list:
+    """Pipeline update adding a receipt or sale to stock and recording it;
+    pair it with a stock >= -delta filter so stock never goes below zero"""
+    stock = {'$add': ['$stock', delta]}
+    return [{'$set': {
+        'stock': stock,
+        'updated_at': now,
+        'movements': appended(movement(delta, RECEIPT if delta > 0 else SALE, stock, now)),
+    }}]
+
+
+def set_update(fields: dict, now: datetime) -> list:
+    """Pipeline update setting stock and/or price; a stock that changes is
+    recorded as a count, with the delta taken from the stock it replaces"""
+    update = {**fields, 'updated_at': now}
+    if 'stock' in fields:
+        stock = fields['stock']
+        update['movements'] = {'$cond': [
+            {'$eq': ['$stock', stock]},
+            {'$ifNull': ['$movements', []]},
+            appended(movement({'$subtract': [stock, '$stock']}, COUNT, stock, now)),
+        ]}
+    return [{'$set': update}]
+
+
+async def record_counts(db, changes: Iterable[Tuple[dict, dict]]) -> List[ObjectId]:
+    """Record stock counts written without set_update (the importer),
+    given (before, after) documents; returns the ids whose stock changed
+    """
+    now = datetime.utcnow()
+    movements = [
+        {'tyre_id': after['_id'], **movement(after['stock'] - before.get('stock', 0), COUNT, after['stock'], now)}
+        for before, after in changes
+        if 'stock' in after and after['stock'] != before.get('stock', 0)
+    ]
+    if movements:
+        await db.stock_movements.insert_many(movements, ordered=False)
+    return [item['tyre_id'] for item in movements]
+
+
+async def move_movements(db, batch_size: int = 500) -> int:
+    """Move pending movements from tyres into stock_movements, batch_size
+    tyres at a time; returns the number moved"""
+    moved = 0
+    cursor = db.tyres.find({'movements._id': {'$exists': True}}, {'movements': 1})
+    while True:
+        tyres = await cursor.to_list(batch_size)
+        if not tyres:
+            return moved
+        entries = [{**entry, 'tyre_id': tyre['_id']} for tyre in tyres for entry in tyre['movements']]
+        try:
+            await db.stock_movements.insert_many(entries, ordered=False)
+        except BulkWriteError as e:
+            # Entries already moved by another worker or an interrupted pass
+            if any(error['code'] != DUPLICATE_KEY for error in e.details['writeErrors']):
+                raise
+        await db.tyres.bulk_write([
+            UpdateOne(
+                {'_id': tyre['_id']},
+                {'$pull': {'movements': {'_id': {'$in': [entry['_id'] for entry in tyre['movements']]}}}},
+            )
+            for tyre in tyres
+        ], ordered=False)
+        moved += len(entries)
+
+
+async def pending_movements(db, tyre_id: ObjectId) -> List[dict]:
+    """Movements of one tyre not yet moved to the ledger"""
+    tyre = await db.tyres.find_one({'_id': tyre_id}, {'movements': 1})
+    return (tyre or {}).get('movements', [])
+
+
+async def move_forever(db, interval: float) -> None:
+    """Background task: move pending movements every `interval` seconds
+    until cancelled"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await move_movements(db)
+        except Exception:
+            logger.exception("Moving stock movements failed")
@@ -0,0 +1,93 @@
+"""In-memory prefix index for search-box suggestions.
+
+Each kind of term (brand, size, pattern) keeps its distinct normalised
+keys in a sorted list with the number of tyres carrying each one. A
+prefix is located with a binary search and its completions are the run
+of keys that follow, so a lookup touches only the matching part of the
+vocabulary. Sizes are normalised with size_key ("90/100*10" and
+"90-100-10" are both "9010010"); brands and patterns keep only their
+lower-case letters and digits.
+"""
+import heapq
+from bisect import bisect_left, insort
+from typing import Callable, Dict, Iterator, List, Tuple
+
+from fuzzy_index import normalise
+from tyre_keys import size_key
+
+Suggestion = Tuple[str, str, int]  # (kind, value as first seen, tyre count)
+
+
+class PrefixIndex:
+    """Sorted distinct keys of one kind of term, with counts"""
+
+    def __init__(self, key: Callable[[str], str]):
+        self.key = key
+        self.keys: List[str] = []
+        self.counts: Dict[str, int] = {}
+        self.values: Dict[str, str] = {}
+
+    def add(self, value: str) -> None:
+        key = self.key(value)
+        if not key:
+            return
+        if key not in self.counts:
+            insort(self.keys, key)
+            self.counts[key] = 0
+            self.values[key] = value
+        self.counts[key] += 1
+
+    def discard(self, value: str) -> None:
+        key = self.key(value)
+        if key not in self.counts:
+            return
+        self.counts[key] -= 1
+        if not self.counts[key]:
+            del self.keys[bisect_left(self.keys, key)]
+            del self.counts[key]
+            del self.values[key]
+
+    def complete(self, prefix: str) -> Iterator[Tuple[str, int]]:
+        """(value, count) for every key starting with prefix, in key order"""
+        index = bisect_left(self.keys, prefix)
+        while index < len(self.keys) and self.keys[index].startswith(prefix):
+            key = self.keys[index]
+            yield self.values[key], self.counts[key]
+            index += 1
+
+
+class SuggestIndex:
+    KINDS = {'brand': normalise, 'size': size_key, 'pattern': normalise}
+
+    def __init__(self):
+        self.terms = {kind: PrefixIndex(key) for kind, key in self.KINDS.items()}
+        self.tyres: Dict[str, Tuple[str, ...]] = {}  # tyre id -> its brand, size, pattern
+
+    def __len__(self) -> int:
+        return len(self.tyres)
+
+    def upsert(self, tyre: dict) -> None:
+        tyre_id = str(tyre.get('_id') or tyre['id'])
+        values = tuple(tyre[kind] for kind in self.KINDS)
+        if self.tyres.get(tyre_id) == values:
+            return
+        self.remove(tyre_id)
+        for kind, value in zip(self.KINDS, values):
+            self.terms[kind].add(value)
+        self.tyres[tyre_id] = values
+
+    def remove(self, tyre_id: str) -> None:
+        values = self.tyres.pop(tyre_id, None)
+        if values is None:
+            return
+        for kind, value in zip(self.KINDS, values):
+            self.terms[kind].discard(value)
+
+    def suggest(self, query: str, limit: int) -> List[Suggestion]:
+        """Top completions of query over every kind, most common first"""
+        matches = []
+        for kind, key in self.KINDS.items():
+            prefix = key(query)
+            if prefix:
+                matches.extend((kind, value, count) for value, count in self.terms[kind].complete(prefix))
+        return heapq.nsmallest(limit, matches, key=lambda match: (-match[2], len(match[1]), match[1]))
@@ -0,0 +1,92 @@
+"""Per-brand inventory totals kept up to date by the write routes.
+
+Each brand has one document in `brand_summaries` with its SKU count,
+units in stock, stock value (price x stock) and number of low-stock
+tyres. Writes apply the difference between a tyre's old and new totals
+with $inc, so reading the summary costs one small query however large
+the catalogue is. reconcile_summary rebuilds every document from a full
+aggregation, correcting any drift from writes that raced each other.
+"""
+import asyncio
+import logging
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from pymongo import DeleteMany, ReplaceOne, UpdateOne
+
+# Tyres with this many or fewer units count as low stock (as in the app)
+LOW_STOCK_LEVEL = 5
+
+TOTALS = ('skus', 'units', 'value', 'low_stock')
+
+logger = logging.getLogger(__name__)
+
+
+def tyre_totals(tyre: Optional[dict]) -> Dict[str, float]:
+    """What one tyre document adds to its brand's totals"""
+    if tyre is None:
+        return dict.fromkeys(TOTALS, 0)
+    stock = tyre.get('stock', 0)
+    return {
+        'skus': 1,
+        'units': stock,
+        'value': tyre.get('price', 0) * stock,
+        'low_stock': int(stock <= LOW_STOCK_LEVEL),
+    }
+
+
+async def record_changes(db, changes: Iterable[Tuple[Optional[dict], Optional[dict]]]) -> None:
+    """Apply (before, after) tyre documents to the summaries; None stands
+    for a tyre that did not exist before or no longer exists after.
+    Documents need brand, stock and price.
+    """
+    deltas = defaultdict(lambda: dict.fromkeys(TOTALS, 0))
+    for before, after in changes:
+        for tyre, sign in ((before, -1), (after, 1)):
+            if tyre is not None:
+                for name, value in tyre_totals(tyre).items():
+                    deltas[tyre['brand']][name] += sign * value
+
+    operations = [
+        UpdateOne({'_id': brand}, {'$inc': delta}, upsert=True)
+        for brand, delta in deltas.items() if any(delta.values())
+    ]
+    if operations:
+        await db.brand_summaries.bulk_write(operations, ordered=False)
+
+
+async def record_change(db, before: Optional[dict], after: Optional[dict]) -> None:
+    await record_changes(db, [(before, after)])
+
+
+async def read_summary(db) -> List[dict]:
+    """Brand summary documents, by brand"""
+    return await db.brand_summaries.find({'skus': {'$gt': 0}}).sort('_id', 1).to_list(None)
+
+
+async def reconcile_summary(db) -> List[dict]:
+    """Rebuild the summaries from the tyres collection and return them"""
+    brands = await db.tyres.aggregate([
+        {'$group': {
+            '_id': '$brand',
+            'skus': {'$sum': 1},
+            'units': {'$sum': '$stock'},
+            'value': {'$sum': {'$multiply': ['$price', '$stock']}},
+            'low_stock': {'$sum': {'$cond': [{'$lte': ['$stock', LOW_STOCK_LEVEL]}, 1, 0]}},
+        }},
+        {'$sort': {'_id': 1}},
+    ]).to_list(None)
+    operations = [ReplaceOne({'_id': brand['_id']}, brand, upsert=True) for brand in brands]
+    operations.append(DeleteMany({'_id': {'$nin': [brand['_id'] for brand in brands]}}))
+    await db.brand_summaries.bulk_write(operations, ordered=False)
+    return brands
+
+
+async def reconcile_forever(db, interval: float) -> None:
+    """Background task: reconcile every `interval` seconds until cancelled"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await reconcile_summary(db)
+        except Exception:
+            logger.exception("Summary reconciliation failed")
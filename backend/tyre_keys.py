@@ -0,0 +1,135 @@
+"""Normalised search keys stored alongside each tyre document.
+
+Searching on these keys with equality or anchored prefix matches lets
+MongoDB use the indexes in SEARCH_INDEXES instead of scanning the whole
+collection with a case-insensitive regex. Sizes are also parsed into
+numeric width/aspect/rim fields so range queries ("all 17-inch rims")
+are index scans too.
+"""
+import re
+from datetime import datetime
+from typing import Optional
+
+from pymongo import ASCENDING, IndexModel, UpdateOne
+
+# Separators that vary between price lists: 80/100*18, 155D*12, 275 * 18,
+# 300X10, 155R13
+SIZE_SEPARATORS = re.compile(r'[^0-9a-z]|[dxr]')
+
+# Structured sizes: 80/100*18 (metric), 155D*12 / 155R13 (marked
+# construction), 275*18, 300X10 or 2.75-18 (inch code). X is always the
+# separator, never a construction letter.
+SIZE_PATTERN = re.compile(
+    r'^(?P<width>\d+(?:\.\d+)?)'
+    r'(?:/(?P<aspect>\d+))?'
+    r'(?P<construction>[A-WYZ])?'
+    r'[*X-]?'
+    r'(?P<construction2>[A-WYZ])?'
+    r'(?P<rim>\d+(?:\.\d+)?)$'
+)
+
+# Bump when derived fields change so existing documents are migrated
+KEYS_VERSION = 5
+
+SEARCH_INDEXES = [
+    [('brand_key', ASCENDING), ('size_key', ASCENDING)],
+    [('size_key', ASCENDING)],
+    [('pattern_key', ASCENDING)],
+    [('rim', ASCENDING), ('width', ASCENDING), ('aspect', ASCENDING)],
+    [('width', ASCENDING), ('aspect', ASCENDING)],
+]
+
+# A price-list row is identified by these fields; the importer upserts on
+# them, and the unique index stops concurrent upserts inserting one twice
+NATURAL_KEY = ('brand', 'size', 'type', 'pattern')
+NATURAL_KEY_INDEX = IndexModel([(field, ASCENDING) for field in NATURAL_KEY], unique=True)
+
+
+def brand_key(brand: str) -> str:
+    """Lower-cased, trimmed brand used for indexed brand lookups"""
+    return brand.strip().lower()
+
+
+def pattern_key(pattern: str) -> str:
+    """Lower-cased, trimmed tread pattern used for indexed pattern lookups"""
+    return pattern.strip().lower()
+
+
+def size_key(size: str) -> str:
+    """Size with separators stripped, e.g. 80/100*18 -> 8010018 and
+    300X10 -> 30010"""
+    return SIZE_SEPARATORS.sub('', size.lower())
+
+
+def parse_size(size: str) -> dict:
+    """Split a size string into numeric fields.
+
+    Width is in the size's own notation: millimetres for metric sizes
+    (80/100*18, 155D*12) and inches for inch-code sizes (275*18 -> 2.75).
+    Unrecognised sizes give None for every field.
+    """
+    fields = {'width': None, 'aspect': None, 'rim': None, 'construction': None}
+    match = SIZE_PATTERN.match(re.sub(r'\s+', '', size.upper()))
+    if not match:
+        return fields
+
+    width = float(match['width'])
+    construction = match['construction'] or match['construction2']
+    if not (match['aspect'] or construction or '.' in match['width']):
+        # Inch code written without the decimal point: 275 -> 2.75
+        width = width / 100
+    fields['width'] = width
+    fields['aspect'] = int(match['aspect']) if match['aspect'] else None
+    fields['rim'] = float(match['rim'])
+    fields['construction'] = construction
+    return fields
+
+
+def search_keys(tyre: dict) -> dict:
+    """Search key and parsed size fields to store on a tyre document"""
+    return {
+        'brand_key': brand_key(tyre['brand']),
+        'size_key': size_key(tyre['size']),
+        'pattern_key': pattern_key(tyre['pattern']),
+        **parse_size(tyre['size']),
+        'keys_v': KEYS_VERSION,
+    }
+
+
+def range_filter(low: Optional[float], high: Optional[float]) -> Optional[dict]:
+    """Inclusive range query, or None when neither bound is given"""
+    bounds = {}
+    if low is not None:
+        bounds['$gte'] = low
+    if high is not None:
+        bounds['$lte'] = high
+    return bounds or None
+
+
+def prefix_match(key: str) -> dict:
+    """Anchored, case-sensitive prefix query that can use an index"""
+    return {'$regex': '^' + re.escape(key)}
+
+
+async def backfill_search_keys(collection, batch_size: int = 500) -> int:
+    """Add or refresh search keys on documents from an older KEYS_VERSION.
+
+    Documents without timestamps (older imports) get them set to now so
+    they show up in the changes feed.
+    """
+    now = datetime.utcnow()
+    updated = 0
+    batch = []
+    async for tyre in collection.find({'keys_v': {'$ne': KEYS_VERSION}}, {'brand': 1, 'size': 1, 'pattern': 1}):
+        batch.append(UpdateOne({'_id': tyre['_id']}, {
+            '$set': search_keys(tyre),
+            '$min': {'created_at': now, 'updated_at': now},
+        }))
+        if len(batch) >= batch_size:
+            await collection.bulk_write(batch, ordered=False)
+            updated += len(batch)
+            batch = []
+    if batch:
+        await collection.bulk_write(batch, ordered=False)
+        updated += len(batch)
+    return updated
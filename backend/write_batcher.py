@@ -0,0 +1,77 @@
+"""Group commit for bursts of small writes.
+
+WriteBatcher collects updates for up to `window` seconds or `max_batch`
+requests, whichever comes first, merges updates to the same key (later
+fields winning) and applies the whole batch with one call to `flush`.
+Each waiting request then gets the result for its own key.
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Tuple
+
+from metrics import registry
+
+registry.describe('write_batches_total', "Batches flushed by the write batcher")
+registry.describe('write_batch_requests_total', "Requests answered by batched writes")
+
+# flush(updates by key) -> result or exception for each key
+Flush = Callable[[Dict[Hashable, dict]], Awaitable[Dict[Hashable, Any]]]
+
+
+class WriteBatcher:
+    def __init__(self, flush: Flush, window: float, max_batch: int):
+        self.flush = flush
+        self.window = window
+        self.max_batch = max_batch
+        self.pending: Dict[Hashable, Tuple[dict, List[asyncio.Future]]] = {}
+        self.waiting = 0
+        self.timer = None
+        self.flushing = set()
+
+    async def submit(self, key: Hashable, fields: dict) -> Any:
+        """Queue an update and wait for the batch it ends up in"""
+        future = asyncio.get_running_loop().create_future()
+        merged, futures = self.pending.setdefault(key, ({}, []))
+        merged.update(fields)
+        futures.append(future)
+        self.waiting += 1
+
+        if self.waiting >= self.max_batch:
+            self._flush_now()
+        elif self.timer is None:
+            self.timer = asyncio.get_running_loop().call_later(self.window, self._flush_now)
+        return await future
+
+    def _flush_now(self) -> None:
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        batch, self.pending, self.waiting = self.pending, {}, 0
+        if batch:
+            task = asyncio.create_task(self._apply(batch))
+            self.flushing.add(task)
+            task.add_done_callback(self.flushing.discard)
+
+    async def _apply(self, batch: Dict[Hashable, Tuple[dict, List[asyncio.Future]]]) -> None:
+        registry.increment('write_batches_total', ())
+        registry.increment('write_batch_requests_total', (), sum(len(futures) for _, futures in batch.values()))
+        try:
+            results = await self.flush({key: fields for key, (fields, _) in batch.items()})
+        except Exception as e:
+            results = dict.fromkeys(batch, e)
+
+        for key, (_, futures) in batch.items():
+            result = results[key]
+            for future in futures:
+                if future.done():
+                    # The request went away while waiting
+                    continue
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+    async def close(self) -> None:
+        """Flush whatever is queued and wait for batches still being written"""
+        self._flush_now()
+        if self.flushing:
+            await asyncio.gather(*self.flushing, return_exceptions=True)
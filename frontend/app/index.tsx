@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import {
   View,
   Text,
@@ -18,6 +18,66 @@ import { Ionicons } from '@expo/vector-icons';
 
 const BACKEND_URL = process.env.EXPO_PUBLIC_BACKEND_URL;
 
+// Compact list format: field names once, then one array per tyre
+const LIST_FIELDS = 'brand,size,type,pattern,stock,price';
+
+interface ColumnarPage {
+  fields: string[];
+  rows: any[][];
+}
+
+// Catalog version returned by our last write; sent back on reads so a
+// replica that has not caught up yet is never used for them
+let writtenVersion: string | null = null;
+
+const readHeaders = (): Record<string, string> =>
+  writtenVersion ? { 'X-Catalog-Version': writtenVersion } : {};
+
+// Token of the last live change applied, so a reconnect resumes after it
+let liveToken: string | null = null;
+const LIVE_RETRY_MS = 2000;
+
+// Suggestions are fetched once typing pauses for this long
+const SUGGEST_DEBOUNCE_MS = 150;
+
+// The list is searched on the server once typing pauses for this long
+const SEARCH_DEBOUNCE_MS = 300;
+const PAGE_SIZE = 200;
+
+// Brand chip and search box; a query starting with a digit is a size,
+// anything else a pattern
+interface ListFilter {
+  brand: string;
+  query: string;
+}
+
+const listPath = ({ brand, query }: ListFilter): string => {
+  const params = ['format=columnar', `fields=${LIST_FIELDS}`, `limit=${PAGE_SIZE}`];
+  if (brand !== 'All') {
+    params.push(`brand=${encodeURIComponent(brand)}`);
+  }
+  if (query) {
+    params.push(`${/^\d/.test(query) ? 'size' : 'pattern'}=${encodeURIComponent(query)}`);
+  }
+  const route = brand !== 'All' || query ? '/api/tyres/search' : '/api/tyres';
+  return `${route}?${params.join('&')}`;
+};
+
+const fromColumnar = ({ fields, rows }: ColumnarPage): Tyre[] =>
+  rows.map((row) => Object.fromEntries(fields.map((field, i) => [field, row[i]])) as Tyre);
+
+interface Suggestion {
+  kind: 'brand' | 'size' | 'pattern';
+  value: string;
+  count: number;
+}
+
+type LiveMessage =
+  | { type: 'upsert'; token: string; tyre: Tyre }
+  | { type: 'delete'; token: string; id: string }
+  | { type: 'ready'; token: string | null }
+  | { type: 'reset' };
+
 interface Tyre {
   id: string;
   brand: string;
@@ -30,10 +90,20 @@ interface Tyre {
 
 export default function Index() {
   const [tyres, setTyres] = useState<Tyre[]>([]);
-  const [filteredTyres, setFilteredTyres] = useState<Tyre[]>([]);
   const [loading, setLoading] = useState(true);
   const [refreshing, setRefreshing] = useState(false);
+  const [loadingMore, setLoadingMore] = useState(false);
+  // X-Next-Cursor of the last page loaded (null once every page is in),
+  // and a counter that lets a reload discard pages still in flight
+  const nextCursor = useRef<string | null>(null);
+  const listGeneration = useRef(0);
+  const fetchingMore = useRef(false);
+  // Filter the loaded pages belong to; read through a ref so the live
+  // socket's handlers see the current one
+  const listFilter = useRef<ListFilter>({ brand: 'All', query: '' });
   const [searchQuery, setSearchQuery] = useState('');
+  const [listQuery, setListQuery] = useState('');
+  const [suggestions, setSuggestions] = useState<Suggestion[]>([]);
   const [selectedBrand, setSelectedBrand] = useState<string>('All');
   const [brands, setBrands] = useState<string[]>(['All']);
   const [modalVisible, setModalVisible] = useState(false);
@@ -42,32 +112,133 @@ export default function Index() {
   const [newPrice, setNewPrice] = useState('');
 
   useEffect(() => {
-    fetchTyres();
     fetchBrands();
   }, []);
 
   useEffect(() => {
-    filterTyres();
-  }, [tyres, searchQuery, selectedBrand]);
+    // Changes made on any device arrive here as they happen
+    let socket: WebSocket;
+    let retry: ReturnType<typeof setTimeout>;
+    let stopped = false;
+    const connect = () => {
+      const query = liveToken ? `?after=${encodeURIComponent(liveToken)}` : '';
+      socket = new WebSocket(`${BACKEND_URL!.replace(/^http/, 'ws')}/api/tyres/live${query}`);
+      socket.onmessage = (event) => applyLiveChange(JSON.parse(event.data));
+      socket.onclose = () => {
+        if (!stopped) {
+          retry = setTimeout(connect, LIVE_RETRY_MS);
+        }
+      };
+    };
+    connect();
+    return () => {
+      stopped = true;
+      clearTimeout(retry);
+      socket.close();
+    };
+  }, []);
+
+  useEffect(() => {
+    const timer = setTimeout(() => setListQuery(searchQuery.trim()), SEARCH_DEBOUNCE_MS);
+    return () => clearTimeout(timer);
+  }, [searchQuery]);
+
+  useEffect(() => {
+    // A new filter starts again from the first page
+    listFilter.current = { brand: selectedBrand, query: listQuery };
+    nextCursor.current = null;
+    fetchTyres();
+  }, [selectedBrand, listQuery]);
+
+  useEffect(() => {
+    if (!searchQuery.trim()) {
+      setSuggestions([]);
+      return;
+    }
+    // A newer query aborts the request for an older one, so its
+    // suggestions can never replace the current ones
+    const controller = new AbortController();
+    const timer = setTimeout(() => fetchSuggestions(searchQuery, controller.signal), SUGGEST_DEBOUNCE_MS);
+    return () => {
+      clearTimeout(timer);
+      controller.abort();
+    };
+  }, [searchQuery]);
+
+  const fetchPage = async (cursor: string | null) => {
+    let path = listPath(listFilter.current);
+    if (cursor) {
+      path += `&cursor=${encodeURIComponent(cursor)}`;
+    }
+    const response = await fetch(`${BACKEND_URL}${path}`, { headers: readHeaders() });
+    const page = fromColumnar(await response.json());
+    return { page, cursor: response.headers.get('X-Next-Cursor') };
+  };
 
   const fetchTyres = async () => {
+    // Only the first page for the current filter; the rest load as the
+    // list is scrolled
+    const generation = ++listGeneration.current;
     try {
-      const response = await fetch(`${BACKEND_URL}/api/tyres`);
-      const data = await response.json();
-      setTyres(data);
-      setLoading(false);
-      setRefreshing(false);
+      const { page, cursor } = await fetchPage(null);
+      if (generation === listGeneration.current) {
+        nextCursor.current = cursor;
+        setTyres(page);
+      }
     } catch (error) {
       console.error('Error fetching tyres:', error);
       Alert.alert('Error', 'Failed to load tyres');
-      setLoading(false);
-      setRefreshing(false);
+    }
+    setLoading(false);
+    setRefreshing(false);
+  };
+
+  const fetchMoreTyres = async () => {
+    if (fetchingMore.current || !nextCursor.current) {
+      return;
+    }
+    const generation = listGeneration.current;
+    fetchingMore.current = true;
+    setLoadingMore(true);
+    try {
+      const { page, cursor } = await fetchPage(nextCursor.current);
+      if (generation === listGeneration.current) {
+        nextCursor.current = cursor;
+        setTyres((current) => current.concat(page));
+      }
+    } catch (error) {
+      console.error('Error fetching more tyres:', error);
+    }
+    fetchingMore.current = false;
+    setLoadingMore(false);
+  };
+
+  const applyLiveChange = (message: LiveMessage) => {
+    if (message.type === 'reset') {
+      // Missed more changes than the server keeps; start over
+      fetchTyres();
+      return;
+    }
+    liveToken = message.token;
+    if (message.type === 'upsert') {
+      const changed = message.tyre;
+      setTyres((current) =>
+        current.some((tyre) => tyre.id === changed.id)
+          ? current.map((tyre) => (tyre.id === changed.id ? changed : tyre))
+          : nextCursor.current
+            ? current // not loaded yet; its page will bring the new version
+            : listFilter.current.brand !== 'All' || listFilter.current.query
+              ? current // matching is left to the server; shown on the next search
+              : [...current, changed]
+      );
+    } else if (message.type === 'delete') {
+      setTyres((current) => current.filter((tyre) => tyre.id !== message.id));
     }
   };
 
   const fetchBrands = async () => {
     try {
-      const response = await fetch(`${BACKEND_URL}/api/tyres/brands`);
+      const response = await fetch(`${BACKEND_URL}/api/tyres/brands`, { headers: readHeaders() });
       const data = await response.json();
       setBrands(['All', ...data.brands]);
     } catch (error) {
@@ -75,24 +246,32 @@ export default function Index() {
     }
   };
 
-  const filterTyres = () => {
-    let filtered = tyres;
-
-    // Filter by brand
-    if (selectedBrand !== 'All') {
-      filtered = filtered.filter((tyre) => tyre.brand === selectedBrand);
-    }
-
-    // Filter by search query
-    if (searchQuery) {
-      filtered = filtered.filter(
-        (tyre) =>
-          tyre.size.toLowerCase().includes(searchQuery.toLowerCase()) ||
-          tyre.pattern.toLowerCase().includes(searchQuery.toLowerCase())
+  const fetchSuggestions = async (query: string, signal: AbortSignal) => {
+    try {
+      const response = await fetch(
+        `${BACKEND_URL}/api/tyres/suggest?q=${encodeURIComponent(query)}&limit=8`,
+        { signal }
       );
+      const data: Suggestion[] = await response.json();
+      if (signal.aborted) {
+        return;
+      }
+      // Nothing to suggest once the query is a complete value
+      setSuggestions(data.filter((suggestion) => suggestion.value !== query));
+    } catch (error) {
+      if (!signal.aborted) {
+        console.error('Error fetching suggestions:', error);
+      }
     }
+  };
 
-    setFilteredTyres(filtered);
+  const applySuggestion = (suggestion: Suggestion) => {
+    if (suggestion.kind === 'brand') {
+      setSelectedBrand(suggestion.value);
+      setSearchQuery('');
+    } else {
+      setSearchQuery(suggestion.value);
+    }
   };
 
   const openEditModal = (tyre: Tyre) => {
@@ -126,6 +305,7 @@ export default function Index() {
       });
 
       if (response.ok) {
+        writtenVersion = response.headers.get('X-Catalog-Version') ?? writtenVersion;
         Alert.alert('Success', 'Tyre updated successfully');
         setModalVisible(false);
         fetchTyres();
@@ -191,7 +371,7 @@ export default function Index() {
       {/* Header */}
       <View style={styles.header}>
         <Text style={styles.headerTitle}>Tyre Inventory</Text>
-        <Text style={styles.headerSubtitle}>{filteredTyres.length} items</Text>
+        <Text style={styles.headerSubtitle}>{tyres.length} items</Text>
       </View>
 
       {/* Search Bar */}
@@ -211,6 +391,28 @@ export default function Index() {
         ) : null}
       </View>
 
+      {/* Suggestions */}
+      {suggestions.length > 0 ? (
+        <ScrollView
+          horizontal
+          keyboardShouldPersistTaps="handled"
+          showsHorizontalScrollIndicator={false}
+          style={styles.suggestions}
+          contentContainerStyle={styles.suggestionsContent}
+        >
+          {suggestions.map((suggestion) => (
+            <TouchableOpacity
+              key={`${suggestion.kind}:${suggestion.value}`}
+              style={styles.suggestionChip}
+              onPress={() => applySuggestion(suggestion)}
+            >
+              <Text style={styles.suggestionText}>{suggestion.value}</Text>
+              <Text style={styles.suggestionCount}>{suggestion.count}</Text>
+            </TouchableOpacity>
+          ))}
+        </ScrollView>
+      ) : null}
+
       {/* Brand Filter */}
       <View style={styles.brandFilterContainer}>
         <ScrollView
@@ -243,13 +445,18 @@ export default function Index() {
 
       {/* Tyre List */}
       <FlatList
-        data={filteredTyres}
+        data={tyres}
         renderItem={renderTyreCard}
         keyExtractor={(item) => item.id}
         contentContainerStyle={styles.listContent}
         refreshControl={
           <RefreshControl refreshing={refreshing} onRefresh={onRefresh} tintColor="#007AFF" />
         }
+        onEndReached={fetchMoreTyres}
+        onEndReachedThreshold={0.5}
+        ListFooterComponent={
+          loadingMore ? <ActivityIndicator style={styles.listFooter} color="#007AFF" /> : null
+        }
         ListEmptyComponent={
           <View style={styles.emptyContainer}>
             <Ionicons name="albums-outline" size={64} color="#666" />
@@ -377,6 +584,32 @@ const styles = StyleSheet.create({
     color: '#FFF',
     fontSize: 16,
   },
+  suggestions: {
+    maxHeight: 44,
+    marginBottom: 8,
+  },
+  suggestionsContent: {
+    paddingHorizontal: 20,
+    gap: 8,
+  },
+  suggestionChip: {
+    flexDirection: 'row',
+    alignItems: 'center',
+    paddingHorizontal: 14,
+    paddingVertical: 8,
+    backgroundColor: '#1C1C1E',
+    borderRadius: 18,
+    gap: 6,
+  },
+  suggestionText: {
+    color: '#FFF',
+    fontSize: 14,
+    fontWeight: '600',
+  },
+  suggestionCount: {
+    color: '#999',
+    fontSize: 12,
+  },
   brandFilterContainer: {
     backgroundColor: '#0F0F0F',
     paddingVertical: 8,
@@ -416,6 +649,9 @@ const styles = StyleSheet.create({
     paddingHorizontal: 20,
     paddingBottom: 20,
   },
+  listFooter: {
+    paddingVertical: 16,
+  },
   card: {
     backgroundColor: '#1C1C1E',
     borderRadius: 16,
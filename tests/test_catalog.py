@@ -0,0 +1,60 @@
+import pytest
+from starlette.requests import Request
+
+from catalog import CatalogCache, etag_matches, make_etag
+
+
+def request_with(if_none_match=None) -> Request:
+    headers = [(b'if-none-match', if_none_match.encode())] if if_none_match is not None else []
+    return Request({'type': 'http', 'method': 'GET', 'path': '/', 'headers': headers})
+
+
+def test_make_etag():
+    assert make_etag(7) == '"7"'
+    assert make_etag(7, 'columnar') == '"7-columnar"'
+
+
+@pytest.mark.parametrize('header, matches', [
+    (None, False),
+    ('', False),
+    ('"7"', True),
+    ('W/"7"', True),
+    ('"6", "7"', True),
+    ('"6",W/"7"', True),
+    ('*', True),
+    ('"6"', False),
+    ('"7-columnar"', False),
+    ('7', False),
+])
+def test_etag_matches(header, matches):
+    assert etag_matches(request_with(header), '"7"') is matches
+
+
+def test_catalog_cache_is_per_version():
+    cache = CatalogCache()
+    cache.put(1, 'brands', b'old')
+    assert cache.get(1, 'brands') == b'old'
+    assert cache.get(2, 'brands') is None
+
+    cache.put(2, 'brands', b'new')
+    assert cache.get(1, 'brands') is None
+    assert cache.get(2, 'brands') == b'new'
+
+
+def test_catalog_cache_ignores_stale_puts():
+    cache = CatalogCache()
+    cache.put(3, 'brands', b'current')
+    cache.put(2, 'brands', b'stale')
+    assert cache.get(3, 'brands') == b'current'
+    assert cache.get(2, 'brands') is None
+
+
+def test_catalog_cache_evicts_least_recently_used():
+    cache = CatalogCache(max_entries=2)
+    cache.put(1, 'a', 1)
+    cache.put(1, 'b', 2)
+    cache.get(1, 'a')
+    cache.put(1, 'c', 3)
+    assert cache.get(1, 'a') == 1
+    assert cache.get(1, 'b') is None
+    assert cache.get(1, 'c') == 3
@@ -0,0 +1,159 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+
+from changes import (
+    EPOCH,
+    MIN_OBJECT_ID,
+    SYNC_SAFETY_WINDOW,
+    TOMBSTONE_RETENTION,
+    after,
+    decode_token,
+    encode_token,
+    expired,
+    fetch_changes,
+    next_position,
+)
+
+
+def test_token_round_trip():
+    position = (datetime(2026, 10, 18, 12, 30, 5, 123000), ObjectId())
+    assert decode_token(encode_token(position)) == position
+
+
+def test_token_keeps_milliseconds_only():
+    # BSON dates have millisecond precision, so tokens do too
+    oid = ObjectId()
+    updated_at, _ = decode_token(encode_token((datetime(2026, 1, 1, 0, 0, 0, 999999), oid)))
+    assert updated_at == datetime(2026, 1, 1, 0, 0, 0, 999000)
+
+
+@pytest.mark.parametrize('token', [
+    '',
+    'abc',
+    '123',
+    'x-' + str(ObjectId()),
+    '123-nothex',
+    '99999999999999999999-' + str(ObjectId()),
+])
+def test_decode_token_rejects_foreign_tokens(token):
+    with pytest.raises(ValueError):
+        decode_token(token)
+
+
+def test_after():
+    assert after(None) == {}
+    position = (EPOCH, MIN_OBJECT_ID)
+    assert after(position) == {'$or': [
+        {'updated_at': {'$gt': EPOCH}},
+        {'updated_at': EPOCH, '_id': {'$gt': MIN_OBJECT_ID}},
+    ]}
+
+
+def test_after_tombstones():
+    position = (EPOCH, MIN_OBJECT_ID)
+    assert after(position, 'deleted_at') == {'$or': [
+        {'deleted_at': {'$gt': EPOCH}},
+        {'deleted_at': EPOCH, '_id': {'$gt': MIN_OBJECT_ID}},
+    ]}
+
+
+def test_expired():
+    assert not expired((datetime.utcnow() - timedelta(days=1), ObjectId()))
+    assert expired((datetime.utcnow() - TOMBSTONE_RETENTION - timedelta(minutes=1), ObjectId()))
+
+
+def test_next_position_mid_feed_continues_from_last_row():
+    last = (datetime.utcnow(), ObjectId())
+    assert next_position(None, last, True) == last
+
+
+def test_next_position_final_page_stops_at_horizon():
+    last = (datetime.utcnow(), ObjectId())
+    updated_at, oid = next_position(None, last, False)
+    assert oid == MIN_OBJECT_ID
+    assert updated_at <= datetime.utcnow() - SYNC_SAFETY_WINDOW
+
+    old = (datetime.utcnow() - timedelta(hours=1), ObjectId())
+    assert next_position(None, old, False) == old
+
+
+def test_next_position_never_moves_back():
+    since = (datetime.utcnow(), ObjectId())
+    assert next_position(since, None, False) == since
+
+
+class Cursor:
+    """Enough of a Motor cursor for fetch_changes: sort, limit, to_list"""
+
+    def __init__(self, documents, field):
+        self.documents = documents
+        self.field = field
+
+    def sort(self, keys):
+        self.documents.sort(key=lambda document: (document[self.field], document['_id']))
+        return self
+
+    def limit(self, count):
+        self.documents = self.documents[:count]
+        return self
+
+    async def to_list(self, length):
+        return self.documents[:length]
+
+
+class Collection:
+    def __init__(self, documents, field):
+        self.documents = documents
+        self.field = field
+
+    def find(self, query):
+        position = None
+        if query:
+            later, same = query['$or']
+            position = (later[self.field]['$gt'], same['_id']['$gt'])
+        return Cursor([
+            document for document in self.documents
+            if position is None or (document[self.field], document['_id']) > position
+        ], self.field)
+
+
+class Database:
+    def __init__(self, tyres, tombstones):
+        self.tyres = Collection(tyres, 'updated_at')
+        self.tyre_tombstones = Collection(tombstones, 'deleted_at')
+
+
+def minutes_ago(minutes):
+    return datetime.utcnow().replace(microsecond=0) - timedelta(minutes=minutes)
+
+
+def test_fetch_changes_skips_tombstones_on_first_sync():
+    db = Database(
+        [{'_id': ObjectId(), 'updated_at': minutes_ago(10)}],
+        [{'_id': ObjectId(), 'deleted_at': minutes_ago(20)}],
+    )
+    tyres, deleted, _, has_more = asyncio.run(fetch_changes(db, None, 10))
+    assert len(tyres) == 1
+    assert deleted == []
+    assert not has_more
+
+
+def test_fetch_changes_pages_tyres_and_tombstones_together():
+    tyres = [{'_id': ObjectId(), 'updated_at': minutes_ago(minutes)} for minutes in (50, 30, 10)]
+    tombstones = [{'_id': ObjectId(), 'deleted_at': minutes_ago(minutes)} for minutes in (40, 20)]
+    db = Database(tyres, tombstones)
+
+    position = (minutes_ago(60), MIN_OBJECT_ID)
+    seen, deleted, position, has_more = asyncio.run(fetch_changes(db, position, 3))
+    assert [tyre['_id'] for tyre in seen] == [tyres[0]['_id'], tyres[1]['_id']]
+    assert deleted == [tombstones[0]['_id']]
+    assert has_more
+    assert position == (tyres[1]['updated_at'], tyres[1]['_id'])
+
+    seen, deleted, position, has_more = asyncio.run(fetch_changes(db, position, 3))
+    assert [tyre['_id'] for tyre in seen] == [tyres[2]['_id']]
+    assert deleted == [tombstones[1]['_id']]
+    assert not has_more
@@ -0,0 +1,84 @@
+from datetime import datetime
+
+from column_store import ColumnStore
+from tyre_keys import search_keys
+
+
+def tyre(tyre_id: str, brand: str, size: str, stock: int, price: float, **fields) -> dict:
+    doc = {
+        'id': tyre_id, 'brand': brand, 'size': size, 'type': 'Tubeless', 'pattern': 'ZAPPER',
+        'stock': stock, 'price': price, **fields,
+    }
+    doc.update(search_keys(doc))
+    return doc
+
+
+def make_store() -> ColumnStore:
+    store = ColumnStore(capacity=2)
+    store.upsert(tyre('1', 'MRF', '80/100*18', 10, 1500.0))
+    store.upsert(tyre('2', 'MRF', '90/90*17', 2, 1800.0))
+    store.upsert(tyre('3', 'CEAT', '275*18', 0, 1200.0))
+    store.upsert(tyre('4', 'TVS', '155D*12', 7, 2400.0, pattern='Eurogrip'))
+    return store
+
+
+def ids(store: ColumnStore, **filters) -> list:
+    return [row['id'] for row in store.rows(store.query(**filters))]
+
+
+def test_query_without_filters_returns_every_row():
+    store = make_store()
+    assert len(store) == 4
+    assert ids(store) == ['1', '2', '3', '4']
+
+
+def test_prefix_filters_use_normalised_keys():
+    store = make_store()
+    assert ids(store, brand='mr') == ['1', '2']
+    assert ids(store, size='90/90') == ['2']
+    assert ids(store, size='9090') == ['2']
+    assert ids(store, brand='mrf', size='80') == ['1']
+    assert ids(store, pattern='euro') == ['4']
+    assert ids(store, pattern='zap') == ['1', '2', '3']
+
+
+def test_range_filters():
+    store = make_store()
+    assert ids(store, min_rim=18, max_rim=18) == ['1', '3']
+    assert ids(store, min_width=80, max_width=100) == ['1', '2']
+    assert ids(store, aspect=90) == ['2']
+    assert ids(store, min_price=1500, max_price=2000) == ['1', '2']
+    assert ids(store, max_stock=5) == ['2', '3']
+
+
+def test_upsert_updates_in_place_and_remove_reuses_slots():
+    store = make_store()
+    store.upsert(tyre('2', 'MRF', '90/90*17', 20, 1800.0))
+    assert ids(store, max_stock=5) == ['3']
+
+    store.remove('3')
+    store.remove('missing')
+    assert ids(store) == ['1', '2', '4']
+    store.upsert(tyre('5', 'CEAT', '300X10', 4, 900.0))
+    assert ids(store) == ['1', '2', '5', '4']
+    assert ids(store, max_width=3) == ['5']
+
+
+def test_page_orders_by_id_after_the_cursor():
+    store = make_store()
+    store.remove('2')
+    store.upsert(tyre('5', 'CEAT', '300X10', 4, 900.0))
+    slots = store.query()
+    assert [row['id'] for row in store.rows(store.page(slots, None, 3))] == ['1', '3', '4']
+    assert [row['id'] for row in store.rows(store.page(slots, '3', 3))] == ['4', '5']
+    assert len(store.page(slots, '5', 3)) == 0
+
+
+def test_rows():
+    store = ColumnStore()
+    store.upsert(tyre('1', 'MRF', '80/100*18', 10, 1500.0, updated_at=datetime(2026, 10, 18, 12, 0, 0, 123000)))
+    [row] = store.rows(store.query())
+    assert row == {
+        'id': '1', 'brand': 'MRF', 'size': '80/100*18', 'type': 'Tubeless', 'pattern': 'ZAPPER',
+        'stock': 10, 'price': 1500.0, 'created_at': None, 'updated_at': '2026-10-18T12:00:00.123000',
+    }
@@ -0,0 +1,51 @@
+from fuzzy_index import TrigramIndex, normalise, trigrams
+
+
+def tyre(tyre_id: str, brand: str, pattern: str) -> dict:
+    return {'id': tyre_id, 'brand': brand, 'pattern': pattern}
+
+
+def make_index() -> TrigramIndex:
+    index = TrigramIndex()
+    index.upsert(tyre('1', 'MRF', 'NYLOGRIP ZAPPER'))
+    index.upsert(tyre('2', 'MRF', 'NYLOGRIP ZAPPER'))
+    index.upsert(tyre('3', 'TVS', 'SECURALYFE'))
+    index.upsert(tyre('4', 'CEAT', 'SEC.ZOOM'))
+    return index
+
+
+def test_normalise_and_trigrams():
+    assert normalise('Sec. Zoom-F') == 'seczoomf'
+    assert trigrams('ab') == {'$$a', '$ab', 'ab$'}
+    assert trigrams('') == set()
+
+
+def test_search_tolerates_misspellings():
+    index = make_index()
+    assert [tyre_id for tyre_id, _ in index.search('naylogrip')] == ['1', '2']
+    assert index.search('seuralyef')[0][0] == '3'
+    assert index.search('sec zoom')[0] == ('4', 1.0)
+
+
+def test_search_respects_limit_and_min_score():
+    index = make_index()
+    assert len(index.search('nylogrip', limit=1)) == 1
+    assert index.search('xyzzy') == []
+    assert index.search('') == []
+
+
+def test_upsert_moves_a_tyre_to_its_new_entry():
+    index = make_index()
+    index.upsert(tyre('3', 'TVS', 'ATT 450'))
+    assert index.search('securalyfe') == []
+    assert index.search('att 450')[0][0] == '3'
+    assert len(index) == 4
+
+
+def test_remove_drops_unused_postings():
+    index = make_index()
+    index.remove('4')
+    index.remove('missing')
+    assert index.search('sec zoom', min_score=0.9) == []
+    assert not any(entry == ('ceat', 'seczoom') for entries in index.postings.values() for entry in entries)
+    assert len(index) == 3
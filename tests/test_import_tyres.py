@@ -0,0 +1,81 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from import_tyres import parse_row, upsert_operation, upsert_tyres
+from tyre_keys import search_keys
+
+ROW = {'brand': ' MRF ', 'size': '300X10', 'type': 'TL', 'pattern': 'ZAPPER', 'price': '1,140'}
+NOW = datetime(2026, 10, 18)
+
+
+def test_parse_row():
+    assert parse_row(ROW) == {'brand': 'MRF', 'size': '300X10', 'type': 'TL', 'pattern': 'ZAPPER', 'price': 1140.0}
+    assert parse_row({**ROW, 'stock': '12.0'})['stock'] == 12
+
+
+@pytest.mark.parametrize('row', [
+    {**ROW, 'brand': ''},
+    {**ROW, 'price': 'n/a'},
+    {**ROW, 'stock': 'many'},
+])
+def test_parse_row_rejects_unusable_rows(row):
+    with pytest.raises(ValueError):
+        parse_row(row)
+
+
+def test_upsert_without_stock_leaves_existing_stock():
+    tyre = parse_row(ROW)
+    assert upsert_operation(tyre, NOW) == UpdateOne(
+        {'brand': 'MRF', 'size': '300X10', 'type': 'TL', 'pattern': 'ZAPPER'},
+        {
+            '$set': {**tyre, **search_keys(tyre), 'updated_at': NOW},
+            '$setOnInsert': {'created_at': NOW, 'stock': 0},
+        },
+        upsert=True,
+    )
+
+
+def test_upsert_with_stock_sets_it_outright():
+    tyre = parse_row({**ROW, 'stock': '4'})
+    assert upsert_operation(tyre, NOW) == UpdateOne(
+        {'brand': 'MRF', 'size': '300X10', 'type': 'TL', 'pattern': 'ZAPPER'},
+        {
+            '$set': {**tyre, **search_keys(tyre), 'updated_at': NOW},
+            '$setOnInsert': {'created_at': NOW},
+        },
+        upsert=True,
+    )
+
+
+class Tyres:
+    """Fails the first write as if another importer inserted row 1 first"""
+
+    def __init__(self, inserted_id):
+        self.inserted_id = inserted_id
+        self.writes = []
+
+    async def bulk_write(self, operations, ordered):
+        self.writes.append(operations)
+        if len(self.writes) == 1:
+            raise BulkWriteError({
+                'writeErrors': [{'index': 1, 'code': 11000, 'errmsg': 'duplicate key'}],
+                'upserted': [{'index': 0, '_id': self.inserted_id}],
+            })
+
+
+class Database:
+    def __init__(self, inserted_id):
+        self.tyres = Tyres(inserted_id)
+
+
+def test_upsert_tyres_retries_rows_that_lost_an_insert_race():
+    tyres = [parse_row(ROW), parse_row({**ROW, 'pattern': 'ZAPPER FS'})]
+    inserted_id = ObjectId()
+    db = Database(inserted_id)
+    assert asyncio.run(upsert_tyres(db, tyres, NOW)) == {0: inserted_id}
+    assert db.tyres.writes[1] == [upsert_operation(tyres[1], NOW)]
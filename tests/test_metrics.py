@@ -0,0 +1,62 @@
+from types import SimpleNamespace
+
+from metrics import BUCKETS, MetricsRegistry, MongoCommandListener, format_labels, registry
+
+
+def test_render_histogram_buckets_are_cumulative():
+    metrics = MetricsRegistry()
+    metrics.describe('latency_seconds', "Latency")
+    labels = (('route', '/api/tyres'),)
+    for seconds in (0.003, 0.003, 0.2, 20.0):
+        metrics.observe('latency_seconds', labels, seconds)
+
+    lines = metrics.render().splitlines()
+    assert lines[:2] == ['# HELP latency_seconds Latency', '# TYPE latency_seconds histogram']
+    assert 'latency_seconds_bucket{route="/api/tyres",le="0.0025"} 0' in lines
+    assert 'latency_seconds_bucket{route="/api/tyres",le="0.005"} 2' in lines
+    assert 'latency_seconds_bucket{route="/api/tyres",le="0.25"} 3' in lines
+    assert 'latency_seconds_bucket{route="/api/tyres",le="10.0"} 3' in lines
+    assert 'latency_seconds_bucket{route="/api/tyres",le="+Inf"} 4' in lines
+    assert 'latency_seconds_count{route="/api/tyres"} 4' in lines
+    assert len([line for line in lines if '_bucket' in line]) == len(BUCKETS) + 1
+
+
+def test_render_counters():
+    metrics = MetricsRegistry()
+    metrics.increment('responses_total', (('status', '200'),))
+    metrics.increment('responses_total', (('status', '200'),), 2)
+    metrics.increment('responses_total', (('status', '404'),))
+    assert metrics.render() == (
+        "# HELP responses_total responses_total\n"
+        "# TYPE responses_total counter\n"
+        'responses_total{status="200"} 3\n'
+        'responses_total{status="404"} 1\n'
+    )
+
+
+def test_format_labels_escapes_values():
+    assert format_labels(()) == ''
+    assert format_labels((('path', 'a"b\\c\nd'),)) == '{path="a\\"b\\\\c\\nd"}'
+
+
+def test_mongo_listener_labels_by_command_and_collection():
+    listener = MongoCommandListener()
+    event = SimpleNamespace(
+        command_name='find', command={'find': 'tyres'}, connection_id=('db', 27017), request_id=1,
+        duration_micros=1500,
+    )
+    listener.started(event)
+    listener.succeeded(event)
+    more = SimpleNamespace(
+        command_name='getMore', command={'getMore': 123, 'collection': 'tyres'},
+        connection_id=('db', 27017), request_id=2, duration_micros=500,
+    )
+    listener.started(more)
+    listener.failed(more)
+
+    histograms = registry.histograms['mongo_command_duration_seconds']
+    assert histograms[(('command', 'find'), ('collection', 'tyres'))].count >= 1
+    assert histograms[(('command', 'getMore'), ('collection', 'tyres'))].count >= 1
+    failures = registry.counters['mongo_command_failures_total']
+    assert failures[(('command', 'getMore'), ('collection', 'tyres'))] >= 1
+    assert not listener.pending
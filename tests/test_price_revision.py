@@ -0,0 +1,30 @@
+from price_revision import price_update, revision_filter
+
+
+def test_price_update_scales_price():
+    assert price_update(5, 0, None) == [
+        {'$set': {'price': {'$multiply': ['$price', 1.05]}, 'updated_at': '$$NOW'}}
+    ]
+
+
+def test_price_update_rounds_then_floors():
+    [stage] = price_update(-10, 5, 100)
+    assert stage['$set']['price'] == {'$max': [
+        {'$multiply': [{'$round': [{'$divide': [{'$multiply': ['$price', 0.9]}, 5]}, 0]}, 5]},
+        100,
+    ]}
+
+
+def test_price_update_stamps_server_time():
+    # A fixed timestamp would fall behind the changes feed on long jobs
+    [stage] = price_update(1, 1, None)
+    assert stage['$set']['updated_at'] == '$$NOW'
+
+
+def test_revision_filter_uses_search_keys():
+    assert revision_filter('MRF', 'Tubeless', '90/100') == {
+        'brand_key': 'mrf',
+        'type': 'Tubeless',
+        'size_key': {'$regex': '^90100'},
+    }
+    assert revision_filter(None, None, None) == {}
@@ -0,0 +1,58 @@
+from bson import ObjectId, Timestamp
+
+from profiler import command_shape, explainable, plan_stages, query_shape, winning_plan
+
+
+def find(collection: str, query: dict) -> tuple:
+    return command_shape('find', {'find': collection, 'filter': query, 'limit': 10})
+
+
+def test_literal_values_share_a_shape():
+    assert find('tyres', {'brand_key': 'mrf'}) == find('tyres', {'brand_key': 'ceat'})
+    assert find('tyres', {'brand_key': 'mrf'}) != find('tyres', {'size_key': 'mrf'})
+
+
+def test_collection_is_kept_literally():
+    assert find('tyres', {'brand_key': 'mrf'}) != find('stock_movements', {'brand_key': 'mrf'})
+
+
+def test_in_lists_of_any_length_share_a_shape():
+    few = find('tyres', {'_id': {'$in': [ObjectId() for _ in range(3)]}})
+    many = find('tyres', {'_id': {'$in': [ObjectId() for _ in range(5000)]}})
+    assert few == many
+    assert few != find('tyres', {'_id': {'$in': ['a', 'b']}})
+
+
+def test_pipelines_keep_their_stages_in_order():
+    match, group = {'$match': {'brand': 'MRF'}}, {'$group': {'_id': '$brand'}}
+    assert query_shape([match, group]) != query_shape([group, match])
+    assert query_shape([match]) != query_shape([match, group])
+
+
+def test_session_fields_are_not_explained():
+    # A find sent in a causally consistent session with a time limit
+    command = {
+        'find': 'tyres',
+        'filter': {'brand_key': {'$regex': '^mrf'}},
+        'limit': 1001,
+        'maxTimeMS': 5000,
+        'lsid': {'id': ObjectId()},
+        'readConcern': {'afterClusterTime': Timestamp(1760000000, 1)},
+        '$clusterTime': {'clusterTime': Timestamp(1760000000, 1)},
+        '$db': 'ocm',
+        '$readPreference': {'mode': 'secondaryPreferred'},
+    }
+    assert explainable(command) == {'find': 'tyres', 'filter': {'brand_key': {'$regex': '^mrf'}}, 'limit': 1001}
+    # Same shape as the find sent outside a session
+    assert command_shape('find', explainable(command)) == find('tyres', {'brand_key': {'$regex': '^ceat'}})
+
+
+def test_plan_stages_and_winning_plan():
+    plan = {
+        'stage': 'FETCH',
+        'inputStage': {'stage': 'SORT', 'inputStage': {'stage': 'COLLSCAN'}},
+    }
+    assert plan_stages(plan) == ['FETCH', 'SORT', 'COLLSCAN']
+    assert winning_plan({'queryPlanner': {'winningPlan': plan}}) is plan
+    assert winning_plan({'stages': [{'$cursor': {'queryPlanner': {'winningPlan': plan}}}]}) is plan
+    assert winning_plan({}) is None
@@ -0,0 +1,119 @@
+import asyncio
+
+import pytest
+
+from search_cache import SearchCache
+
+
+class Loader:
+    """load() stand-in that counts calls and finishes when released"""
+
+    def __init__(self, value='rows'):
+        self.value = value
+        self.calls = 0
+        self.release = asyncio.Event()
+
+    async def __call__(self):
+        self.calls += 1
+        await self.release.wait()
+        return self.value
+
+
+def test_identical_searches_share_one_load():
+    async def scenario():
+        cache = SearchCache()
+        load = Loader()
+        waiting = [asyncio.create_task(cache.get(1, 'q', load)) for _ in range(5)]
+        await asyncio.sleep(0)
+        load.release.set()
+        assert await asyncio.gather(*waiting) == ['rows'] * 5
+        assert load.calls == 1
+
+        # Later identical searches are served from the cache
+        assert await cache.get(1, 'q', load) == 'rows'
+        assert load.calls == 1
+
+    asyncio.run(scenario())
+
+
+def test_entries_belong_to_a_catalog_version():
+    async def scenario():
+        cache = SearchCache()
+        load = Loader()
+        load.release.set()
+        await cache.get(1, 'q', load)
+        await cache.get(2, 'q', load)
+        assert load.calls == 2
+
+    asyncio.run(scenario())
+
+
+def test_entries_expire_after_ttl():
+    async def scenario():
+        cache = SearchCache(ttl=0)
+        load = Loader()
+        load.release.set()
+        await cache.get(1, 'q', load)
+        await cache.get(1, 'q', load)
+        assert load.calls == 2
+
+    asyncio.run(scenario())
+
+
+def test_clear_drops_loads_in_flight():
+    async def scenario():
+        cache = SearchCache()
+        load = Loader()
+        first = asyncio.create_task(cache.get(1, 'q', load))
+        await asyncio.sleep(0)
+        cache.clear()
+        load.release.set()
+        assert await first == 'rows'
+        # The read raced a write, so its result was not kept
+        await cache.get(1, 'q', load)
+        assert load.calls == 2
+
+    asyncio.run(scenario())
+
+
+def test_failed_loads_are_not_cached():
+    async def scenario():
+        cache = SearchCache()
+
+        async def fail():
+            raise RuntimeError('database down')
+
+        with pytest.raises(RuntimeError):
+            await cache.get(1, 'q', fail)
+        load = Loader()
+        load.release.set()
+        assert await cache.get(1, 'q', load) == 'rows'
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_caller_does_not_cancel_shared_load():
+    async def scenario():
+        cache = SearchCache()
+        load = Loader()
+        first = asyncio.create_task(cache.get(1, 'q', load))
+        second = asyncio.create_task(cache.get(1, 'q', load))
+        await asyncio.sleep(0)
+        first.cancel()
+        load.release.set()
+        assert await second == 'rows'
+        assert load.calls == 1
+
+    asyncio.run(scenario())
+
+
+def test_lru_bound():
+    async def scenario():
+        cache = SearchCache(max_entries=2)
+        load = Loader()
+        load.release.set()
+        for key in ('a', 'b', 'c'):
+            await cache.get(1, key, load)
+        assert [key for _, key in cache.entries] == ['b', 'c']
+
+    asyncio.run(scenario())
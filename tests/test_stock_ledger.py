@@ -0,0 +1,106 @@
+import asyncio
+from datetime import datetime
+
+from bson import ObjectId
+from pymongo.errors import BulkWriteError
+
+from stock_ledger import COUNT, RECEIPT, SALE, adjust_update, move_movements, set_update
+
+NOW = datetime(2026, 10, 18)
+
+
+def test_adjust_update_records_receipts_and_sales():
+    [stage] = adjust_update(-2, NOW)
+    entry = stage['$set']['movements']['$concatArrays'][1][0]
+    assert stage['$set']['stock'] == {'$add': ['$stock', -2]}
+    assert stage['$set']['updated_at'] == NOW
+    assert entry['reason'] == SALE
+    assert entry['delta'] == -2
+    assert entry['stock'] == {'$add': ['$stock', -2]}
+    assert isinstance(entry['_id'], ObjectId)
+
+    [stage] = adjust_update(5, NOW)
+    assert stage['$set']['movements']['$concatArrays'][1][0]['reason'] == RECEIPT
+
+
+def test_set_update_records_counts_only_for_stock():
+    [stage] = set_update({'price': 1200.0}, NOW)
+    assert stage == {'$set': {'price': 1200.0, 'updated_at': NOW}}
+
+    [stage] = set_update({'stock': 7}, NOW)
+    unchanged, _, changed = stage['$set']['movements']['$cond']
+    assert stage['$set']['stock'] == 7
+    assert unchanged == {'$eq': ['$stock', 7]}
+    entry = changed['$concatArrays'][1][0]
+    assert entry['reason'] == COUNT
+    assert entry['delta'] == {'$subtract': [7, '$stock']}
+    assert entry['stock'] == 7
+
+
+class Cursor:
+    def __init__(self, documents):
+        self.documents = documents
+
+    async def to_list(self, length):
+        batch, self.documents = self.documents[:length], self.documents[length:]
+        return batch
+
+
+class Tyres:
+    def __init__(self, tyres):
+        self.tyres = tyres
+
+    def find(self, query, projection):
+        return Cursor([dict(tyre) for tyre in self.tyres if tyre.get('movements')])
+
+    async def bulk_write(self, operations, ordered):
+        for operation in operations:
+            tyre = next(tyre for tyre in self.tyres if tyre['_id'] == operation._filter['_id'])
+            moved = operation._doc['$pull']['movements']['_id']['$in']
+            tyre['movements'] = [entry for entry in tyre['movements'] if entry['_id'] not in moved]
+
+
+class Ledger:
+    def __init__(self):
+        self.entries = {}
+
+    async def insert_many(self, entries, ordered):
+        errors = []
+        for index, entry in enumerate(entries):
+            if entry['_id'] in self.entries:
+                errors.append({'index': index, 'code': 11000, 'errmsg': 'duplicate key'})
+            else:
+                self.entries[entry['_id']] = entry
+        if errors:
+            raise BulkWriteError({'writeErrors': errors})
+
+
+class Database:
+    def __init__(self, tyres):
+        self.tyres = Tyres(tyres)
+        self.stock_movements = Ledger()
+
+
+def entry(delta):
+    return {'_id': ObjectId(), 'delta': delta, 'reason': SALE, 'stock': 0, 'at': NOW}
+
+
+def test_move_movements_moves_each_entry_once():
+    async def scenario():
+        first, second, third = entry(-1), entry(-2), entry(3)
+        tyres = [
+            {'_id': ObjectId(), 'movements': [first, second]},
+            {'_id': ObjectId(), 'movements': [third]},
+            {'_id': ObjectId(), 'movements': []},
+        ]
+        db = Database(tyres)
+        # A pass interrupted after its insert already recorded this one
+        db.stock_movements.entries[first['_id']] = {**first, 'tyre_id': tyres[0]['_id']}
+
+        assert await move_movements(db, batch_size=1) == 3
+        assert set(db.stock_movements.entries) == {first['_id'], second['_id'], third['_id']}
+        assert db.stock_movements.entries[third['_id']]['tyre_id'] == tyres[1]['_id']
+        assert all(not tyre['movements'] for tyre in tyres)
+        assert await move_movements(db) == 0
+
+    asyncio.run(scenario())
@@ -0,0 +1,58 @@
+from suggest_index import PrefixIndex, SuggestIndex
+
+
+def tyre(tyre_id: str, brand: str, size: str, pattern: str) -> dict:
+    return {'id': tyre_id, 'brand': brand, 'size': size, 'pattern': pattern}
+
+
+def make_index() -> SuggestIndex:
+    index = SuggestIndex()
+    index.upsert(tyre('1', 'MRF', '90/100*10', 'ZAPPER'))
+    index.upsert(tyre('2', 'MRF', '90/90*12', 'NYLOGRIP'))
+    index.upsert(tyre('3', 'MRF', '90/100*10', 'MASSETER'))
+    index.upsert(tyre('4', 'METRO', '80/100*18', 'CONTI'))
+    return index
+
+
+def test_prefix_index_counts_and_completes_in_key_order():
+    terms = PrefixIndex(str.lower)
+    for value in ('MRF', 'Metro', 'MRF', 'Ceat', ''):
+        terms.add(value)
+    assert list(terms.complete('m')) == [('Metro', 1), ('MRF', 2)]
+    terms.discard('MRF')
+    terms.discard('unknown')
+    assert list(terms.complete('mr')) == [('MRF', 1)]
+    terms.discard('MRF')
+    assert list(terms.complete('mr')) == []
+    assert terms.keys == ['ceat', 'metro']
+
+
+def test_suggest_ranks_most_common_first():
+    index = make_index()
+    assert index.suggest('m', 10) == [
+        ('brand', 'MRF', 3),
+        ('brand', 'METRO', 1),
+        ('pattern', 'MASSETER', 1),
+    ]
+    assert index.suggest('m', 1) == [('brand', 'MRF', 3)]
+
+
+def test_sizes_complete_without_separators():
+    index = make_index()
+    expected = [('size', '90/100*10', 2)]
+    assert index.suggest('90100', 5) == expected
+    assert index.suggest('90/100', 5) == expected
+    assert index.suggest('90-1', 5) == expected
+
+
+def test_upsert_and_remove_keep_counts():
+    index = make_index()
+    index.upsert(tyre('1', 'MRF', '90/100*10', 'ZAPPER'))
+    assert len(index) == 4
+    index.upsert(tyre('1', 'CEAT', '90/100*10', 'ZOOM'))
+    assert index.suggest('mrf', 5) == [('brand', 'MRF', 2)]
+    assert index.suggest('zap', 5) == []
+    index.remove('3')
+    index.remove('missing')
+    assert index.suggest('9010', 5) == [('size', '90/100*10', 1)]
+    assert index.suggest('', 5) == []
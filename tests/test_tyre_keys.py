@@ -0,0 +1,77 @@
+import pytest
+
+from tyre_keys import KEYS_VERSION, brand_key, parse_size, prefix_match, range_filter, search_keys, size_key
+
+
+@pytest.mark.parametrize('size, width, aspect, rim, construction', [
+    # Metric, as in the price lists
+    ('80/100*18', 80.0, 100, 18.0, None),
+    ('100/90*17', 100.0, 90, 17.0, None),
+    ('90/90-12', 90.0, 90, 12.0, None),
+    # Marked construction
+    ('155D*12', 155.0, None, 12.0, 'D'),
+    ('165D*13', 165.0, None, 13.0, 'D'),
+    ('155R13', 155.0, None, 13.0, 'R'),
+    ('145/80R12', 145.0, 80, 12.0, 'R'),
+    # Inch codes, with and without the decimal point
+    ('275*18', 2.75, None, 18.0, None),
+    ('350*8', 3.5, None, 8.0, None),
+    ('2.75-18', 2.75, None, 18.0, None),
+    ('300X10', 3.0, None, 10.0, None),
+    ('3.00X10', 3.0, None, 10.0, None),
+    ('300x10', 3.0, None, 10.0, None),
+    # Spacing and case vary between suppliers
+    ('275 * 18', 2.75, None, 18.0, None),
+    ('155 d * 12', 155.0, None, 12.0, 'D'),
+])
+def test_parse_size(size, width, aspect, rim, construction):
+    assert parse_size(size) == {'width': width, 'aspect': aspect, 'rim': rim, 'construction': construction}
+
+
+@pytest.mark.parametrize('size', ['', 'TUBE', 'R13', '*18', '275*18*4'])
+def test_parse_size_unrecognised(size):
+    assert parse_size(size) == {'width': None, 'aspect': None, 'rim': None, 'construction': None}
+
+
+@pytest.mark.parametrize('size, key', [
+    ('80/100*18', '8010018'),
+    ('155D*12', '15512'),
+    ('155R13', '15513'),
+    ('275 * 18', '27518'),
+    ('300X10', '30010'),
+    ('3.00X10', '30010'),
+])
+def test_size_key(size, key):
+    assert size_key(size) == key
+
+
+def test_size_key_matches_across_notations():
+    # Different separators for the same size share a key, so prefixes match both
+    assert size_key('300X10') == size_key('300*10') == size_key('300-10')
+    assert size_key('90/100*10').startswith(size_key('90100'))
+
+
+def test_search_keys():
+    keys = search_keys({'brand': ' MRF ', 'size': '90/90*17', 'pattern': 'Zapper FS '})
+    assert keys == {
+        'brand_key': 'mrf',
+        'size_key': '909017',
+        'pattern_key': 'zapper fs',
+        'width': 90.0,
+        'aspect': 90,
+        'rim': 17.0,
+        'construction': None,
+        'keys_v': KEYS_VERSION,
+    }
+    assert brand_key('TVS Eurogrip') == 'tvs eurogrip'
+
+
+def test_range_filter():
+    assert range_filter(None, None) is None
+    assert range_filter(10, None) == {'$gte': 10}
+    assert range_filter(None, 18) == {'$lte': 18}
+    assert range_filter(10, 18) == {'$gte': 10, '$lte': 18}
+
+
+def test_prefix_match_escapes():
+    assert prefix_match('2.75') == {'$regex': r'^2\.75'}
@@ -0,0 +1,92 @@
+import asyncio
+
+from write_batcher import WriteBatcher
+
+
+class Flush:
+    """flush() stand-in recording each batch it is given"""
+
+    def __init__(self, fail=None):
+        self.batches = []
+        self.fail = fail
+
+    async def __call__(self, updates):
+        self.batches.append(updates)
+        if self.fail:
+            raise self.fail
+        return {key: {'key': key, **fields} for key, fields in updates.items()}
+
+
+def test_updates_within_the_window_are_merged_into_one_batch():
+    async def scenario():
+        flush = Flush()
+        batcher = WriteBatcher(flush, window=0.01, max_batch=100)
+        results = await asyncio.gather(
+            batcher.submit('a', {'stock': 1}),
+            batcher.submit('b', {'price': 10.0}),
+            batcher.submit('a', {'price': 20.0}),
+            batcher.submit('a', {'stock': 3}),
+        )
+        assert flush.batches == [{'a': {'stock': 3, 'price': 20.0}, 'b': {'price': 10.0}}]
+        # Requests merged into one update share its result
+        assert results[0] == results[2] == results[3] == {'key': 'a', 'stock': 3, 'price': 20.0}
+        assert results[1] == {'key': 'b', 'price': 10.0}
+
+    asyncio.run(scenario())
+
+
+def test_full_batch_flushes_without_waiting_for_the_window():
+    async def scenario():
+        flush = Flush()
+        batcher = WriteBatcher(flush, window=60, max_batch=2)
+        results = await asyncio.wait_for(
+            asyncio.gather(batcher.submit('a', {'stock': 1}), batcher.submit('b', {'stock': 2})),
+            timeout=1,
+        )
+        assert len(flush.batches) == 1
+        assert [result['key'] for result in results] == ['a', 'b']
+
+    asyncio.run(scenario())
+
+
+def test_flush_errors_reach_every_waiting_request():
+    async def scenario():
+        batcher = WriteBatcher(Flush(fail=RuntimeError('write failed')), window=0.01, max_batch=100)
+        results = await asyncio.gather(
+            batcher.submit('a', {'stock': 1}),
+            batcher.submit('b', {'stock': 2}),
+            return_exceptions=True,
+        )
+        assert all(isinstance(result, RuntimeError) for result in results)
+
+    asyncio.run(scenario())
+
+
+def test_per_key_exceptions_go_to_that_key_only():
+    async def scenario():
+        async def flush(updates):
+            return {key: KeyError(key) if key == 'missing' else fields for key, fields in updates.items()}
+
+        batcher = WriteBatcher(flush, window=0.01, max_batch=100)
+        found, missing = await asyncio.gather(
+            batcher.submit('a', {'stock': 1}),
+            batcher.submit('missing', {'stock': 2}),
+            return_exceptions=True,
+        )
+        assert found == {'stock': 1}
+        assert isinstance(missing, KeyError)
+
+    asyncio.run(scenario())
+
+
+def test_close_flushes_queued_updates():
+    async def scenario():
+        flush = Flush()
+        batcher = WriteBatcher(flush, window=60, max_batch=100)
+        waiting = asyncio.create_task(batcher.submit('a', {'stock': 1}))
+        await asyncio.sleep(0)
+        await batcher.close()
+        assert await waiting == {'key': 'a', 'stock': 1}
+        assert flush.batches == [{'a': {'stock': 1}}]
+
+    asyncio.run(scenario())